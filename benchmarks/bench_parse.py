@@ -0,0 +1,98 @@
+"""
+Parse-throughput benchmark for the M3U tokenizer.
+
+Builds a synthetic playlist shaped like the iptv-org files (EXTINF attributes,
+the odd #EXTVLCOPT block, blank lines and comments) and times parse_playlist
+over the whole text and iter_playlist over an open file. Prints JSON.
+
+    python benchmarks/bench_parse.py --channels 100000 --repeat 3
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from utils import iter_playlist, parse_playlist
+
+
+GROUPS = ['News', 'Entertainment', 'Movies', 'Music', 'Kids', 'Religious', 'Sports']
+
+
+def build_playlist(count: int, seed: int = 1, start: int = 0) -> str:
+    rnd = random.Random(seed)
+    lines = ['#EXTM3U x-tvg-url="https://example.com/epg.xml"']
+    for i in range(start, start + count):
+        group = rnd.choice(GROUPS)
+        lines.append(
+            f'#EXTINF:-1 tvg-id="Channel{i}.in@SD" tvg-name="Channel {i}" '
+            f'tvg-logo="https://i.example.com/logo/{i}.png" group-title="{group}",'
+            f'Channel {i} ({rnd.choice(["480p", "720p", "1080p"])})'
+        )
+        if i % 10 == 0:
+            lines.append('#EXTVLCOPT:http-user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64)')
+            lines.append(f'#EXTVLCOPT:http-referrer=https://ref{i % 97}.example.com/')
+        if i % 25 == 0:
+            lines.append('')
+        lines.append(f'https://cdn{i % 50}.example.com/live/{i}/index.m3u8')
+    return '\n'.join(lines) + '\n'
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--channels', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    content = build_playlist(args.channels)
+    size_mb = len(content.encode('utf-8')) / 1e6
+
+    with tempfile.NamedTemporaryFile('w', suffix='.m3u', encoding='utf-8', delete=False) as f:
+        f.write(content)
+        playlist_path = f.name
+
+    def parse_text():
+        return parse_playlist(content, 'bench')
+
+    def stream_file():
+        with open(playlist_path, 'r', encoding='utf-8') as fh:
+            for _ in iter_playlist(fh, 'bench'):
+                pass
+
+    parsed = parse_text()
+    text_s = best_of(args.repeat, parse_text)
+    file_s = best_of(args.repeat, stream_file)
+    Path(playlist_path).unlink()
+
+    print(json.dumps({
+        'benchmark': 'parse_playlist',
+        'channels': len(parsed),
+        'playlist_mb': round(size_mb, 2),
+        'text': {
+            'seconds': round(text_s, 4),
+            'channels_per_sec': round(len(parsed) / text_s),
+            'mb_per_sec': round(size_mb / text_s, 2),
+        },
+        'file_stream': {
+            'seconds': round(file_s, 4),
+            'channels_per_sec': round(len(parsed) / file_s),
+            'mb_per_sec': round(size_mb / file_s, 2),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Scrape and check benchmark against a local stand-in server.
+
+Starts benchmarks/standin_server.py in a subprocess, then, for every catalog
+size, runs a fresh child process that
+
+  * scrapes: fetches synthetic M3U sources, parses them and merges them into
+    an empty catalog, as scraper.py does (without the playlist cache);
+  * checks: probes a synthetic catalog mixing fast HLS, slow TTFB, timeouts,
+    403s, redirect chains and HEAD-rejecting hosts with
+    check_streams_concurrent.
+
+Each size reports channels/sec, p50/p99 probe latency, peak RSS and CPU time
+as JSON, so runs can be diffed.
+
+    python benchmarks/bench_pipeline.py --channels 1000 10000 100000 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import aiohttp
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / 'scripts'))
+
+import dns_cache
+from check_streams import check_streams_concurrent
+from utils import PLAYLIST_HEADERS, fetch_playlist_conditional, merge_catalog, parse_playlist, percentile
+
+
+# Share of the catalog per stand-in behaviour
+PROFILES = {
+    'hls': 0.55,
+    'nohead': 0.15,
+    'forbidden': 0.1,
+    'slow': 0.1,
+    'redirect': 0.09,
+    'timeout': 0.01,
+}
+
+
+def stream_url(profile: str, i: int, port: int) -> str:
+    base = f'http://127.0.0.1:{port}'
+    if profile in ('hls', 'slow'):
+        return f'{base}/{profile}/{i}/master.m3u8'
+    if profile == 'redirect':
+        return f'{base}/redirect/{1 + i % 4}/{i}'
+    if profile == 'nohead':
+        return f'{base}/nohead/{i}.ts'
+    return f'{base}/{profile}/{i}.m3u8'
+
+
+def build_catalog(count: int, port: int, hosts: int, seed: int = 1) -> List[Dict]:
+    rnd = random.Random(seed)
+    names, weights = zip(*PROFILES.items())
+    catalog = []
+    for i in range(count):
+        profile = rnd.choices(names, weights)[0]
+        catalog.append({
+            'id': f'bench{i}',
+            'name': f'Channel {i}',
+            'stream_url': stream_url(profile, i, port + i % hosts),
+        })
+    return catalog
+
+
+def resource_usage() -> Dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_kb = usage.ru_maxrss / 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return {
+        'peak_rss_mb': round(rss_kb / 1024, 1),
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 2),
+    }
+
+
+async def run_scrape(port: int, hosts: int, count: int, sources: int) -> Dict:
+    per_source = max(1, count // sources)
+    urls = [f'http://127.0.0.1:{port + i % hosts}/playlist/{i * per_source}/{per_source}.m3u' for i in range(sources)]
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    async with aiohttp.ClientSession(headers=PLAYLIST_HEADERS) as session:
+        fetched = await asyncio.gather(*(fetch_playlist_conditional(session, url) for url in urls))
+        parsed = []
+        size = 0
+        for url, (state, entry) in zip(urls, fetched):
+            if state == 'failed':
+                continue
+            size += len(entry['body'])
+            parsed.extend(await asyncio.to_thread(parse_playlist, entry['body'], url))
+
+    catalog, _ = merge_catalog([], parsed, datetime.now(timezone.utc).isoformat())
+    seconds = time.perf_counter() - start
+    return {
+        'sources': sources,
+        'channels': len(catalog),
+        'playlist_mb': round(size / 1e6, 2),
+        'seconds': round(seconds, 3),
+        'channels_per_sec': round(len(catalog) / seconds),
+        'cpu_seconds': round(time.process_time() - cpu_start, 2),
+    }
+
+
+async def run_check(catalog: List[Dict], max_workers: int, deep: bool) -> Dict:
+    latencies = []
+    statuses = {}
+
+    def on_result(result):
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+        if result.get('resp_time_ms') is not None:
+            latencies.append(result['resp_time_ms'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resolver = dns_cache.CachingResolver(Path(tmp) / 'dns.json')
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        await check_streams_concurrent(catalog, max_workers, deep=deep, resolver=resolver, on_result=on_result, collect=False)
+        seconds = time.perf_counter() - start
+
+    return {
+        'channels': len(catalog),
+        'seconds': round(seconds, 3),
+        'channels_per_sec': round(len(catalog) / seconds, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'cpu_seconds': round(time.process_time() - cpu_start, 2),
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def run_one(args) -> Dict:
+    count = args.one
+    report = {'channels': count}
+    report['scrape'] = asyncio.run(run_scrape(args.port, args.hosts, count, args.sources))
+    catalog = build_catalog(count, args.port, args.hosts)
+    report['check'] = asyncio.run(run_check(catalog, args.max_workers, args.deep))
+    report.update(resource_usage())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--channels', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--hosts', type=int, default=32, help="stand-in hosts (ports) to spread channels over")
+    parser.add_argument('--sources', type=int, default=8, help="M3U sources for the scrape stage")
+    parser.add_argument('--max-workers', type=int, default=256)
+    parser.add_argument('--deep', action='store_true', help="run HLS deep probes too")
+    parser.add_argument('--port', type=int, default=18000)
+    parser.add_argument('--output', help="also write the JSON report here")
+    parser.add_argument('--one', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(run_one(args)))
+        return
+
+    server = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / 'standin_server.py'), '--port', str(args.port), '--hosts', str(args.hosts)],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        if server.stdout.readline().strip() != 'ready':
+            sys.exit("stand-in server failed to start")
+        runs = []
+        for count in args.channels:
+            # A fresh process per size keeps peak RSS and CPU time comparable
+            cmd = [sys.executable, __file__, '--one', str(count), '--port', str(args.port), '--hosts', str(args.hosts),
+                   '--sources', str(args.sources), '--max-workers', str(args.max_workers)]
+            if args.deep:
+                cmd.append('--deep')
+            child = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
+            runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+            print(f"{count} channels: {runs[-1]['check']['channels_per_sec']} checks/s", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = json.dumps({
+        'benchmark': 'pipeline',
+        'profiles': PROFILES,
+        'hosts': args.hosts,
+        'max_workers': args.max_workers,
+        'deep': args.deep,
+        'runs': runs,
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + '\n', encoding='utf-8')
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
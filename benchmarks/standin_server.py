@@ -0,0 +1,150 @@
+"""
+Local stand-in for IPTV hosts, for offline benchmarks.
+
+One aiohttp app is served on `--hosts` consecutive ports starting at
+`--port`; each port looks like a separate host to the checker. The path
+picks the behaviour:
+
+    /hls/<i>/master.m3u8        fast HLS: master -> media playlist -> 64 KiB segments
+    /slow/<i>/master.m3u8       same, after SLOW_TTFB seconds before the headers
+    /trickle/<i>/master.m3u8    same playlists, segments chunked (no Content-Length) over TRICKLE_SECONDS
+    /timeout/<i>.m3u8           never answers within the checker's timeouts
+    /forbidden/<i>.m3u8         403
+    /redirect/<hops>/<i>        302 chain of <hops> hops ending at a fast HLS master
+    /nohead/<i>.ts              405 on HEAD, MPEG-TS bytes on GET
+    /playlist/<start>/<count>.m3u  M3U source playlist, channels <start>..<start+count>
+
+    python benchmarks/standin_server.py --port 18000 --hosts 32
+
+Prints "ready" on stdout once every port is listening.
+"""
+import argparse
+import asyncio
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_parse import build_playlist
+
+
+SLOW_TTFB = 1.5
+TRICKLE_SECONDS = 12
+HANG_SECONDS = 60
+SEGMENT_BYTES = 64 * 1024
+SEGMENT_SECONDS = 4
+HLS_TYPE = 'application/vnd.apple.mpegurl'
+SEGMENT = bytes(SEGMENT_BYTES)
+
+
+@lru_cache(maxsize=64)
+def playlist_body(start: int, count: int) -> bytes:
+    return build_playlist(count, start=start).encode('utf-8')
+
+
+def master_playlist() -> str:
+    return (
+        '#EXTM3U\n'
+        '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360\n'
+        'low.m3u8\n'
+        '#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720\n'
+        'high.m3u8\n'
+    )
+
+
+def media_playlist() -> str:
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}', '#EXT-X-MEDIA-SEQUENCE:100']
+    for n in range(100, 103):
+        lines.append(f'#EXTINF:{SEGMENT_SECONDS}.0,')
+        lines.append(f'seg{n}.ts')
+    return '\n'.join(lines) + '\n'
+
+
+async def hls(request: web.Request) -> web.Response:
+    if request.match_info['profile'] == 'slow':
+        await asyncio.sleep(SLOW_TTFB)
+    name = request.match_info['file']
+    if name == 'master.m3u8':
+        return web.Response(text=master_playlist(), content_type=HLS_TYPE)
+    if name.endswith('.m3u8'):
+        return web.Response(text=media_playlist(), content_type=HLS_TYPE)
+    if request.match_info['profile'] == 'trickle':
+        return await trickle(request)
+    return web.Response(body=SEGMENT, content_type='video/mp2t')
+
+
+async def trickle(request: web.Request) -> web.StreamResponse:
+    resp = web.StreamResponse(headers={'Content-Type': 'video/mp2t'})
+    resp.enable_chunked_encoding()
+    await resp.prepare(request)
+    pieces = 16
+    for n in range(pieces):
+        await resp.write(SEGMENT[n * SEGMENT_BYTES // pieces:(n + 1) * SEGMENT_BYTES // pieces])
+        await asyncio.sleep(TRICKLE_SECONDS / pieces)
+    await resp.write_eof()
+    return resp
+
+
+async def hang(request: web.Request) -> web.Response:
+    await asyncio.sleep(HANG_SECONDS)
+    return web.Response(status=504)
+
+
+async def forbidden(request: web.Request) -> web.Response:
+    return web.Response(status=403, text='Forbidden')
+
+
+async def redirect(request: web.Request) -> web.Response:
+    hops = int(request.match_info['hops'])
+    i = request.match_info['i']
+    target = f'/redirect/{hops - 1}/{i}' if hops > 1 else f'/hls/{i}/master.m3u8'
+    raise web.HTTPFound(target)
+
+
+async def nohead(request: web.Request) -> web.Response:
+    if request.method == 'HEAD':
+        return web.Response(status=405)
+    return web.Response(body=SEGMENT[:32 * 1024], content_type='video/mp2t')
+
+
+async def playlist(request: web.Request) -> web.Response:
+    body = playlist_body(int(request.match_info['start']), int(request.match_info['count']))
+    return web.Response(body=body, content_type='audio/x-mpegurl')
+
+
+def build_app() -> web.Application:
+    app = web.Application()
+    app.router.add_route('*', r'/{profile:hls|slow|trickle}/{i}/{file}', hls)
+    app.router.add_route('*', r'/timeout/{file}', hang)
+    app.router.add_route('*', r'/forbidden/{file}', forbidden)
+    app.router.add_route('*', r'/redirect/{hops:\d+}/{i}', redirect)
+    app.router.add_route('*', r'/nohead/{file}', nohead)
+    app.router.add_route('GET', r'/playlist/{start:\d+}/{count:\d+}.m3u', playlist)
+    return app
+
+
+async def serve(port: int, hosts: int):
+    runner = web.AppRunner(build_app(), access_log=None)
+    await runner.setup()
+    for offset in range(hosts):
+        await web.TCPSite(runner, '127.0.0.1', port + offset, backlog=1024).start()
+    print('ready', flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in stream server")
+    parser.add_argument('--port', type=int, default=18000)
+    parser.add_argument('--hosts', type=int, default=32)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.port, args.hosts))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
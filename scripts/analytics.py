@@ -0,0 +1,244 @@
+"""
+Uptime and latency analytics over the status history.
+
+Loads the runs of the longest window from the columnar history
+(status_store.py) into channel x run matrices and computes, per window, in
+one vectorized pass:
+
+    uptime          share of probes that got an answer (live, slow or unstable)
+    flaps           up <-> down transitions between consecutive probes
+    mtbf_hours      up time divided by the number of up -> down transitions
+    longest_outage_hours
+    p50_ms, p95_ms  resp_time_ms percentiles
+
+Windows end at the last recorded run; older runs are never read, so the
+cost follows the window, not the whole history. A probe stands for the time until the
+next run, capped at MAX_SAMPLE_SECONDS so gaps between imported daily files
+don't count as days of uptime. Per channel stats go into channels.json under
+"stats"; per category stats go to data/status/analytics.json.
+
+    python scripts/analytics.py
+"""
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from utils import get_project_root, load_json, save_json
+from status_store import STATUS_CODES, StatusHistory
+
+
+WINDOWS = {'7d': 7 * 86400, '30d': 30 * 86400}
+MAX_SAMPLE_SECONDS = 86400
+UP_CODES = (STATUS_CODES['live'], STATUS_CODES['slow'], STATUS_CODES['unstable'])
+DOWN_CODE = STATUS_CODES['dead']
+
+
+def get_analytics_file() -> Path:
+    return get_project_root() / "data" / "status" / "analytics.json"
+
+
+class HistoryMatrix:
+    """
+    status (uint8, 0 = not probed) and resp_time (float32, NaN) as channel x
+    run arrays, over the runs within `span` seconds of the last one and the
+    channels they probed.
+    """
+    
+    def __init__(self, store: StatusHistory, span: float = max(WINDOWS.values())):
+        times = [datetime.fromisoformat(run['run_at']).timestamp() for run in store.runs]
+        end = max(times) if times else 0
+        runs = sorted((t, run['offset'], run['count']) for t, run in zip(times, store.runs) if t > end - span)
+        self.run_times = np.array([t for t, _, _ in runs], dtype=np.float64)
+        self.ids = []
+        self.status = np.zeros((0, len(runs)), dtype=np.uint8)
+        self.resp_time = np.full((0, len(runs)), np.nan, dtype=np.float32)
+        if not runs:
+            return
+        
+        # Only the window's rows are read from the memory-mapped columns
+        columns = store.columns()
+        rows = [slice(offset, offset + count) for _, offset, count in runs]
+        chan = np.concatenate([columns['chan'][r] for r in rows]).astype(np.int64)
+        channels, row_channel = np.unique(chan, return_inverse=True)
+        self.ids = [store.channels[i][0] for i in channels]
+        shape = (len(self.ids), len(runs))
+        self.status = np.zeros(shape, dtype=np.uint8)
+        self.resp_time = np.full(shape, np.nan, dtype=np.float32)
+        run_of_row = np.repeat(np.arange(len(runs)), [count for _, _, count in runs])
+        self.status[row_channel, run_of_row] = np.concatenate([columns['status'][r] for r in rows])
+        self.resp_time[row_channel, run_of_row] = np.concatenate([columns['resp_time'][r] for r in rows])
+    
+    def sample_seconds(self) -> np.ndarray:
+        """How long each run's probe stands for."""
+        times = self.run_times
+        if len(times) < 2:
+            return np.full(len(times), float(MAX_SAMPLE_SECONDS))
+        gaps = np.diff(times)
+        last = np.median(gaps)
+        return np.minimum(np.append(gaps, last), MAX_SAMPLE_SECONDS)
+
+
+def window_stats(status: np.ndarray, resp_time: np.ndarray, seconds: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per row stats for one non-empty window of runs (columns oldest first)."""
+    probed = status != 0
+    up = np.isin(status, UP_CODES)
+    down = status == DOWN_CODE
+    probes = probed.sum(axis=1)
+    answered = up.sum(axis=1)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        uptime = np.where(probes > 0, answered / np.maximum(probes, 1), np.nan)
+    
+    # Carry the last known state over runs that skipped the channel
+    runs = np.arange(status.shape[1])
+    last_probe = np.maximum.accumulate(np.where(probed, runs, -1), axis=1)
+    known = last_probe >= 0
+    rows = np.arange(status.shape[0])[:, None]
+    state_up = up[rows, np.maximum(last_probe, 0)] & known
+    state_down = down[rows, np.maximum(last_probe, 0)] & known
+    
+    changed = probed[:, 1:] & known[:, :-1] & (state_up[:, 1:] != state_up[:, :-1])
+    flaps = changed.sum(axis=1)
+    failures = (changed & state_down[:, 1:]).sum(axis=1)
+    
+    up_seconds = (state_up * seconds).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mtbf = np.where(failures > 0, up_seconds / np.maximum(failures, 1) / 3600, np.nan)
+    
+    # Longest run of down time: running total that restarts at every non-down run
+    down_time = np.cumsum(state_down * seconds, axis=1)
+    restart = np.maximum.accumulate(np.where(state_down, 0, down_time), axis=1)
+    longest = (down_time - restart).max(axis=1) / 3600
+    
+    up_times = np.where(up, resp_time, np.nan)
+    with warnings.catch_warnings():
+        # All-NaN rows (never answered) come back as NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        p50, p95 = np.nanpercentile(up_times, [50, 95], axis=1)
+    
+    return {
+        'probes': probes,
+        'answered': answered,
+        'up_times': up_times,
+        'uptime': uptime,
+        'flaps': flaps,
+        'mtbf_hours': mtbf,
+        'longest_outage_hours': longest,
+        'p50_ms': p50,
+        'p95_ms': p95,
+    }
+
+
+def _value(value, digits: int) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _row(stats: Dict[str, np.ndarray], i: int) -> Dict:
+    return {
+        'probes': int(stats['probes'][i]),
+        'uptime': _value(stats['uptime'][i], 4),
+        'flaps': int(stats['flaps'][i]),
+        'mtbf_hours': _value(stats['mtbf_hours'][i], 1),
+        'longest_outage_hours': _value(stats['longest_outage_hours'][i], 1),
+        'p50_ms': _value(stats['p50_ms'][i], 1),
+        'p95_ms': _value(stats['p95_ms'][i], 1),
+    }
+
+
+def compute(store: StatusHistory, channels: List[Dict]) -> Dict:
+    """Annotate channels with per channel stats; returns the per category report."""
+    matrix = HistoryMatrix(store)
+    position = {channel_id: i for i, channel_id in enumerate(matrix.ids)}
+    seconds = matrix.sample_seconds()
+    
+    # Category of every history row; rows no longer in the catalog get their own bucket
+    categories = sorted({ch.get('category') or 'Other' for ch in channels})
+    category_of = np.full(len(matrix.ids), len(categories), dtype=np.int64)
+    for ch in channels:
+        i = position.get(ch['id'])
+        if i is not None:
+            category_of[i] = categories.index(ch.get('category') or 'Other')
+    
+    report = {'categories': {}, 'windows': {}}
+    per_channel: Dict[str, Dict] = {}
+    end = matrix.run_times[-1] if len(matrix.run_times) else 0
+    for window, span in WINDOWS.items():
+        cols = matrix.run_times > end - span
+        if not cols.any():
+            continue
+        status = matrix.status[:, cols]
+        resp_time = matrix.resp_time[:, cols]
+        stats = window_stats(status, resp_time, seconds[cols])
+        # The newest probe's sample reaches past the window end
+        np.minimum(stats['longest_outage_hours'], span / 3600, out=stats['longest_outage_hours'])
+        report['windows'][window] = {'runs': int(cols.sum())}
+        
+        for ch in channels:
+            i = position.get(ch['id'])
+            if i is not None and stats['probes'][i]:
+                per_channel.setdefault(ch['id'], {})[window] = _row(stats, i)
+        
+        # Per category: pool the probes, not the channel ratios
+        buckets = len(categories) + 1
+        category_probes = np.bincount(category_of, weights=stats['probes'], minlength=buckets)
+        category_up = np.bincount(category_of, weights=stats['answered'], minlength=buckets)
+        category_flaps = np.bincount(category_of, weights=stats['flaps'], minlength=buckets)
+        for c, category in enumerate(categories):
+            if not category_probes[c]:
+                continue
+            samples = stats['up_times'][category_of == c]
+            samples = samples[~np.isnan(samples)]
+            report['categories'].setdefault(category, {})[window] = {
+                'channels': int(((category_of == c) & (stats['probes'] > 0)).sum()),
+                'uptime': round(float(category_up[c] / category_probes[c]), 4),
+                'flaps': int(category_flaps[c]),
+                'p50_ms': round(float(np.percentile(samples, 50)), 1) if samples.size else None,
+                'p95_ms': round(float(np.percentile(samples, 95)), 1) if samples.size else None,
+            }
+    
+    for ch in channels:
+        if ch['id'] in per_channel:
+            ch['stats'] = per_channel[ch['id']]
+        else:
+            ch.pop('stats', None)
+    
+    report['generated_at'] = datetime.now(timezone.utc).isoformat()
+    report['runs'] = len(matrix.run_times)
+    report['channels'] = len(per_channel)
+    return report
+
+
+def main():
+    root = get_project_root()
+    channels_file = root / 'data' / 'channels.json'
+    channels = load_json(str(channels_file))
+    if not channels:
+        print("Error: No channels found")
+        sys.exit(1)
+    
+    start = time.perf_counter()
+    store = StatusHistory()
+    report = compute(store, channels)
+    elapsed = time.perf_counter() - start
+    
+    save_json(channels, str(channels_file))
+    save_json(report, str(get_analytics_file()))
+    print(f"Analytics over {report['runs']} runs for {report['channels']} channels in {elapsed:.2f}s")
+    for category, windows in sorted(report['categories'].items()):
+        week = windows.get('7d') or windows.get('30d')
+        print(f"  {category}: uptime {week['uptime']:.1%}, {week['flaps']} flaps, p50 {week['p50_ms']} ms")
+    print(f"Written to {channels_file} and {get_analytics_file()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,12 @@
 import sys
+import argparse
 import asyncio
-import json
+import signal
 import time
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 import aiohttp
 
@@ -16,47 +18,123 @@ from utils import (
     get_project_root,
     load_json,
     save_json,
-    get_daily_status_file,
+    save_channels_json,
     classify_stream,
     is_browser_playable,
     update_health_score,
 )
+from status_store import StatusHistory
+import run_log
+import scheduler
+import hls_probe
+from host_limiter import HostLimiter, host_key
+import probe_trace
+import dns_cache
+from checkpoint import Checkpoint
+from metrics import RunMetrics
+import analytics
+import clusters
+import probe_cache
+import redirect_cache
 
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+PROGRESS_EVERY = 1000
 
 
-async def check_stream(session: aiohttp.ClientSession, channel: Dict) -> Dict:
-    url = channel.get('stream_url')
-    start_time = time.time()
-    head_success = False
-    get_success = False
-    http_code = 0
-    content_type = ''
-    bytes_read = 0
+class RunStats:
+    """Run summary counters, updated as each result arrives."""
+    
+    def __init__(self):
+        self.total = 0
+        self.probed = 0
+        self.statuses = {'live': 0, 'slow': 0, 'dead': 0, 'unstable': 0}
+        self.browser_restricted = 0
+        self.carried = 0
+        self.fanned = 0
+        self.phases = probe_trace.PhaseStats()
+    
+    def add(self, result: Dict):
+        self.total += 1
+        status = result.get('status')
+        if status in self.statuses:
+            self.statuses[status] += 1
+        if not result.get('browser_playable', True):
+            self.browser_restricted += 1
+        if result.get('via'):
+            self.fanned += 1
+        elif result.get('probed'):
+            self.probed += 1
+            self.phases.add(result.get('timings'))
+        else:
+            self.carried += 1
+
+
+async def fetch_stream(session: aiohttp.ClientSession, url: str, stream_headers: Dict, timings: Dict, validators: Optional[Dict] = None) -> Dict:
+    """HEAD, then a ranged GET if HEAD fails; the raw outcome and the redirect chain followed."""
+    outcome = {'http_code': 0, 'content_type': '', 'head_success': False, 'get_success': False, 'bytes': 0, 'chain': [url]}
     
     try:
-        async with session.head(url, timeout=aiohttp.ClientTimeout(total=6), allow_redirects=True) as resp:
-            http_code = resp.status
-            content_type = resp.headers.get('Content-Type', '')
-            head_success = resp.status < 400
+        async with session.head(url, headers=stream_headers, timeout=aiohttp.ClientTimeout(total=6), allow_redirects=True, trace_request_ctx=timings) as resp:
+            outcome['http_code'] = resp.status
+            outcome['content_type'] = resp.headers.get('Content-Type', '')
+            outcome['head_success'] = resp.status < 400
+            outcome['chain'] = redirect_cache.response_chain(resp)
+            if validators is not None:
+                probe_cache.read_validators(resp, validators)
     except Exception:
-        head_success = False
+        outcome['head_success'] = False
     
-    if not head_success or http_code >= 400:
+    if not outcome['head_success'] or outcome['http_code'] >= 400:
         try:
-            headers = {'Range': 'bytes=0-32767'}
-            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=8), allow_redirects=True) as resp:
-                http_code = resp.status
-                content_type = resp.headers.get('Content-Type', '')
+            headers = {**stream_headers, 'Range': 'bytes=0-32767'}
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=8), allow_redirects=True, trace_request_ctx=timings) as resp:
+                outcome['http_code'] = resp.status
+                outcome['content_type'] = resp.headers.get('Content-Type', '')
+                outcome['chain'] = redirect_cache.response_chain(resp)
+                body_start = time.monotonic()
                 data = await resp.read()
-                bytes_read = len(data)
-                get_success = resp.status < 400
+                probe_trace.add_phase(timings, 'body_ms', time.monotonic() - body_start)
+                outcome['bytes'] = len(data)
+                outcome['get_success'] = resp.status < 400
         except Exception:
-            get_success = False
+            outcome['get_success'] = False
     
+    return outcome
+
+
+async def check_stream(session: aiohttp.ClientSession, channel: Dict, deep: bool = False, deep_budget: int = hls_probe.DEEP_BYTE_BUDGET, timings: Optional[Dict] = None,
+                       validators: Optional[Dict] = None, redirects: Optional[redirect_cache.RedirectCache] = None) -> Dict:
+    url = channel.get('stream_url')
+    if timings is None:
+        timings = probe_trace.new_timings()
+    stream_headers = channel.get('http_headers') or {}
+    start_time = time.time()
+    
+    # Skip a known redirect chain; go back to the original URL only if its target fails
+    target = redirects.target(channel) if redirects else None
+    outcome = await fetch_stream(session, target or url, stream_headers, timings, validators)
+    if target and not (outcome['head_success'] or outcome['get_success']):
+        redirects.fallback(channel)
+        target = None
+        outcome = await fetch_stream(session, url, stream_headers, timings, validators)
+    if redirects and outcome['http_code']:
+        redirects.record(channel, outcome['chain'], shortcut=target is not None)
+    
+    http_code = outcome['http_code']
+    content_type = outcome['content_type']
+    head_success = outcome['head_success']
+    get_success = outcome['get_success']
+    bytes_read = outcome['bytes']
     resp_time_ms = (time.time() - start_time) * 1000
     
     status = classify_stream(http_code, resp_time_ms, content_type, head_success, get_success)
+    
+    deep_result = None
+    if deep and status != 'dead' and hls_probe.is_hls(url, content_type):
+        # Relative playlist URIs resolve against where the redirects ended up
+        deep_result = await hls_probe.deep_probe(session, outcome['chain'][-1], stream_headers, deep_budget)
+        status = hls_probe.classify_deep(status, deep_result)
+    
     browser_playable = is_browser_playable(url, http_code, status, content_type)
     
     result = {
@@ -68,45 +146,256 @@ async def check_stream(session: aiohttp.ClientSession, channel: Dict) -> Dict:
         'content_type': content_type if content_type else None,
         'resp_time_ms': round(resp_time_ms, 2),
         'browser_playable': browser_playable,
-        'checked_at': datetime.now(timezone.utc).isoformat()
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+        'timings': probe_trace.round_timings(timings)
     }
+    if deep_result is not None:
+        result['deep'] = deep_result
+        bytes_read += deep_result.get('bytes') or 0
+    result['bytes'] = bytes_read
     
     return result
 
 
-async def check_streams_concurrent(channels: list, max_workers: int = 20) -> list:
-    connector = aiohttp.TCPConnector(limit_per_host=5, limit=max_workers)
+async def probe_channel(session: aiohttp.ClientSession, channel: Dict, deep: bool, deep_budget: int, timings: Dict,
+                        cache: Optional[probe_cache.ProbeCache] = None, redirects: Optional[redirect_cache.RedirectCache] = None) -> Dict:
+    """
+    One channel's result: a cache revalidation when that confirms it,
+    otherwise a full probe. Never raises; a cache entry that breaks the
+    revalidation or the update is dropped instead.
+    """
+    start = time.monotonic()
+    validators = {}
+    result = None
+    try:
+        entry = cache.revalidatable(channel) if cache else None
+        if entry:
+            result = await cache.revalidate(session, channel, entry, timings, validators)
+    except Exception:
+        cache.forget(channel)
+        validators = {}
+    if result is None:
+        try:
+            result = await check_stream(session, channel, deep, deep_budget, timings, validators, redirects)
+        except Exception as e:
+            result = dead_result(channel, str(e), timings)
+    if cache:
+        try:
+            cache.record(channel, result, (time.monotonic() - start) * 1000, validators)
+        except Exception:
+            cache.forget(channel)
+    return result
+
+
+def open_session(max_workers: int, resolver: dns_cache.CachingResolver) -> aiohttp.ClientSession:
+    # Per-host limits are enforced by the HostLimiter, not the connector
+    connector = aiohttp.TCPConnector(limit=max_workers, limit_per_host=0, resolver=resolver, use_dns_cache=False)
     timeout = aiohttp.ClientTimeout(total=15)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers={'User-Agent': USER_AGENT},
+                                 trace_configs=[probe_trace.make_trace_config()])
+
+
+def dead_result(channel: Dict, error: str, timings: Optional[Dict] = None) -> Dict:
+    result = {
+        'id': channel.get('id'),
+        'name': channel.get('name'),
+        'stream_url': channel.get('stream_url'),
+        'status': 'dead',
+        'http_code': None,
+        'content_type': None,
+        'resp_time_ms': None,
+        'browser_playable': False,
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+    }
+    if timings is not None:
+        result['timings'] = probe_trace.round_timings(timings)
+    result['error'] = error
+    return result
+
+
+def prioritize_channels(channels: list, changes: Optional[Dict]) -> list:
+    """Order channels so ones the scraper just added, then changed, are probed first."""
+    if not changes:
+        return channels
+    rank = {}
+    for channel_id in changes.get('changed', []):
+        rank[channel_id] = 1
+    for channel_id in changes.get('added', []):
+        rank[channel_id] = 0
+    return sorted(channels, key=lambda ch: rank.get(ch['id'], 2))
+
+
+async def check_streams_concurrent(channels: list, max_workers: int = 256, deep: bool = False, deep_budget: int = hls_probe.DEEP_BYTE_BUDGET, limiter: Optional[HostLimiter] = None, resolver: Optional[dns_cache.CachingResolver] = None,
+                                   on_result: Optional[Callable[[Dict], None]] = None, deadline: Optional[float] = None, collect: bool = True,
+                                   cache: Optional[probe_cache.ProbeCache] = None, redirects: Optional[redirect_cache.RedirectCache] = None) -> list:
+    """
+    Probe channels with a fixed pool of `max_workers` worker tasks.
+    
+    A dispatcher parks channels per host and feeds a bounded queue one host
+    slot at a time, so memory doesn't grow with the catalog beyond the
+    channel list itself. `on_result` sees each result as it completes; with
+    collect=False results are only streamed there and an empty list is
+    returned. Probing stops at `deadline` (a time.monotonic() value) or on
+    SIGTERM; channels still unprobed then are simply missing from the results.
+    
+    With a `cache`, stable channels within their TTL are answered from it and
+    expired ones are revalidated with a conditional HEAD before a full probe.
+    --deep results are never cached. With `redirects`, channels whose URL
+    redirected last time are probed at the cached final URL first.
+    """
+    limiter = limiter or HostLimiter(global_limit=max_workers)
+    resolver = resolver or dns_cache.CachingResolver()
+    cache = None if deep else cache
     results = []
     
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={'User-Agent': USER_AGENT}) as session:
-        semaphore = asyncio.Semaphore(max_workers)
+    def emit(result):
+        if on_result:
+            on_result(result)
+        if collect:
+            results.append(result)
+    
+    # Resolve every host up front; channels on NXDOMAIN hosts are dead without a request
+    urls = [ch.get('stream_url') for ch in channels]
+    if redirects:
+        urls += [target for target in map(redirects.target, channels) if target]
+    dns_outcomes = await resolver.prefetch(dns_cache.unique_hosts(urls))
+    nxdomain = {host for host, outcome in dns_outcomes.items() if outcome == 'nxdomain'}
+    
+    backlog: Dict[str, deque] = {}
+    for ch in channels:
+        url = ch.get('stream_url') or ''
+        cached = cache.lookup(ch) if cache else None
+        if cached:
+            emit(cached)
+        elif nxdomain and dns_cache.url_hostname(url) in nxdomain:
+            emit(dead_result(ch, 'NXDOMAIN'))
+        else:
+            backlog.setdefault(host_key(url), deque()).append(ch)
+    
+    # Hosts that have parked channels and may have a free slot, round-robin
+    ready = deque(backlog)
+    in_ready = set(ready)
+    wakeup = asyncio.Event()
+    
+    def on_available(host):
+        if backlog.get(host) and host not in in_ready:
+            ready.append(host)
+            in_ready.add(host)
+            wakeup.set()
+    
+    limiter.on_available = on_available
+    queue = asyncio.Queue(maxsize=max_workers)
+    worker_count = max(1, min(max_workers, sum(len(q) for q in backlog.values())))
+    
+    async with open_session(max_workers, resolver) as session:
+    
+        async def dispatch():
+            while backlog:
+                if not ready:
+                    wakeup.clear()
+                    await wakeup.wait()
+                    continue
+                host = ready.popleft()
+                in_ready.discard(host)
+                # A full host is re-queued by on_available when a slot frees up
+                if not limiter.try_acquire(host):
+                    continue
+                parked = backlog[host]
+                ch = parked.popleft()
+                if parked:
+                    on_available(host)
+                else:
+                    del backlog[host]
+                await queue.put((ch, host, time.monotonic()))
+            for _ in range(worker_count):
+                await queue.put(None)
         
-        async def bounded_check(ch):
-            async with semaphore:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                ch, host, queued_at = item
+                timings = probe_trace.new_timings()
+                start = time.monotonic()
+                probe_trace.add_phase(timings, 'queue_ms', start - queued_at)
                 try:
-                    return await check_stream(session, ch)
-                except Exception as e:
-                    return {
-                        'id': ch.get('id'),
-                        'name': ch.get('name'),
-                        'stream_url': ch.get('stream_url'),
-                        'status': 'dead',
-                        'http_code': None,
-                        'content_type': None,
-                        'resp_time_ms': None,
-                        'browser_playable': False,
-                        'checked_at': datetime.now(timezone.utc).isoformat(),
-                        'error': str(e)
-                    }
+                    result = await probe_channel(session, ch, deep, deep_budget, timings, cache, redirects)
+                    limiter.record(host, (time.monotonic() - start) * 1000, result.get('http_code'))
+                finally:
+                    # Also on cancellation, so on_available keeps the dispatcher fed
+                    limiter.release(host)
+                emit(result)
         
-        tasks = [bounded_check(ch) for ch in channels]
-        results = await asyncio.gather(*tasks)
+        tasks = [asyncio.ensure_future(dispatch())] + [asyncio.ensure_future(worker()) for _ in range(worker_count)]
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+        
+        all_done = asyncio.ensure_future(asyncio.wait(tasks))
+        stopped = asyncio.ensure_future(stop.wait())
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        await asyncio.wait([all_done, stopped], timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        stopped.cancel()
+        if not all_done.done():
+            all_done.cancel()
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            loop.remove_signal_handler(signal.SIGTERM)
+        except (NotImplementedError, RuntimeError):
+            pass
+        limiter.on_available = None
     
+    await resolver.close()
+    resolver.save()
+    if cache:
+        cache.save()
+    if redirects:
+        redirects.save()
     return results
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Probe every channel in data/channels.json")
+    parser.add_argument('--deep', action='store_true',
+                        help="fetch HLS variant playlists and segments to measure real throughput")
+    parser.add_argument('--deep-budget', type=int, default=hls_probe.DEEP_BYTE_BUDGET,
+                        help="max bytes downloaded per channel in --deep mode")
+    parser.add_argument('--max-workers', type=int, default=256,
+                        help="global cap on probes in flight across all hosts")
+    parser.add_argument('--deadline', type=float,
+                        help="stop probing after this many seconds and write partial results")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run, probing only channels it hadn't finished")
+    parser.add_argument('--all-members', action='store_true',
+                        help="probe every member of a duplicate cluster instead of one per cluster")
+    parser.add_argument('--no-probe-cache', action='store_true',
+                        help="probe every channel instead of reusing stable results from data/cache/probes.json")
+    parser.add_argument('--no-redirect-cache', action='store_true',
+                        help="always start at the catalog URL instead of the final URL cached in data/cache/redirects.json")
+    parser.add_argument('--serve', action='store_true',
+                        help="run as a daemon: probe continuously over --cycle and serve the status API")
+    parser.add_argument('--cycle', type=float, default=scheduler.RUN_INTERVAL.total_seconds(),
+                        help="--serve: seconds over which every channel is probed once")
+    parser.add_argument('--flush-every', type=float, default=300,
+                        help="--serve: seconds between writes of the status files")
+    parser.add_argument('--bind', default='127.0.0.1',
+                        help="--serve: address of the status API")
+    parser.add_argument('--port', type=int, default=8321,
+                        help="--serve: port of the status API")
+    args = parser.parse_args()
+    
+    if args.serve:
+        # daemon.py builds on this module's probe functions
+        import daemon
+        daemon.serve(args)
+        return
+    
     root = get_project_root()
     channels_file = root / 'data' / 'channels.json'
     
@@ -119,45 +408,172 @@ def main():
         print("Error: No channels found")
         sys.exit(1)
     
-    print(f"Checking {len(channels)} channels...")
+    started = time.monotonic()
+    metrics = RunMetrics('checker')
+    previous = run_log.materialize()
+    last_status = previous[0]
+    checkpoint = Checkpoint()
+    resumed = {}
+    header = None
+    cluster_of = {} if args.all_members else clusters.load_cluster_map()
+    skipped = []
     
-    results = asyncio.run(check_streams_concurrent(channels))
+    if args.resume and checkpoint.exists():
+        header, resumed = checkpoint.load()
+    if header:
+        planned = set(header['planned'])
+        to_probe = [ch for ch in channels if ch['id'] in planned and ch['id'] not in resumed]
+        deferred = [ch for ch in channels if ch['id'] not in planned and ch['id'] in last_status]
+        checkpoint.reopen()
+        print(f"Resuming run from {header['run_at']}: {len(resumed)} done, {len(to_probe)} left")
+    else:
+        if args.resume:
+            print("No checkpoint to resume; starting a new run")
+        elif checkpoint.exists():
+            print("Discarding checkpoint of an unfinished run (use --resume to continue it)")
+        to_probe, deferred = scheduler.select_channels(channels, datetime.now(timezone.utc), known_ids=set(last_status))
+        to_probe, skipped = clusters.pick_targets(to_probe, cluster_of)
+        checkpoint.start(datetime.now(timezone.utc).isoformat(), [ch['id'] for ch in to_probe])
+        print(f"Checking {len(to_probe)} of {len(channels)} channels ({len(deferred)} backed off, "
+              f"{len(skipped)} covered by a duplicate)...")
     
-    status_file = get_daily_status_file()
-    save_json(results, str(status_file))
+    metrics.set('stage_seconds', time.monotonic() - started, {'stage': 'schedule'})
     
-    print(f"\nStatus written to {status_file}")
+    # Results are folded into the status view as they complete instead of being collected:
+    # the run keeps one record per channel, plus the ids of the ones probed (fresh)
+    stats = RunStats()
+    fold = run_log.RunFold(previous)
+    for result in resumed.values():
+        result.setdefault('probed', True)
+        stats.add(result)
+        fold.add(result)
+    fresh = set()
     
-    stats = {
-        'total': len(results),
-        'live': sum(1 for r in results if r['status'] == 'live'),
-        'slow': sum(1 for r in results if r['status'] == 'slow'),
-        'dead': sum(1 for r in results if r['status'] == 'dead'),
-        'unstable': sum(1 for r in results if r['status'] == 'unstable'),
-        'browser_restricted': sum(1 for r in results if not r.get('browser_playable', True))
-    }
+    def on_result(result):
+        # A cache hit stands in for a probe but measured nothing; it is carried like a deferred channel
+        result['probed'] = result.get('cached') != 'hit'
+        checkpoint.add(result)
+        stats.add(result)
+        fold.add(result)
+        if not result['probed']:
+            return
+        fresh.add(result['id'])
+        metrics.inc('probes_total', labels={'status': result['status'], 'http_code': result.get('http_code') or 0})
+        metrics.inc('bytes_downloaded_total', result.get('bytes') or 0)
+        if stats.probed % PROGRESS_EVERY == 0:
+            print(f"  {stats.probed} probed, {stats.statuses['dead']} dead ({time.monotonic() - started:.0f}s)")
+    
+    changes = load_json(str(root / 'data' / 'changes.json'))
+    limiter = HostLimiter(global_limit=args.max_workers)
+    resolver = dns_cache.CachingResolver()
+    cache = None if args.no_probe_cache else probe_cache.ProbeCache()
+    redirects = None if args.no_redirect_cache else redirect_cache.RedirectCache()
+    deadline = started + args.deadline if args.deadline else None
+    
+    async def probe():
+        async with metrics.loop_lag():
+            await check_streams_concurrent(prioritize_channels(to_probe, changes), args.max_workers, args.deep, args.deep_budget,
+                                           limiter, resolver, on_result=on_result, deadline=deadline, collect=False, cache=cache, redirects=redirects)
+    
+    with metrics.stage('probe'):
+        asyncio.run(probe())
+    checkpoint.close()
+    timing_summary = stats.phases.summary()
+    
+    # Duplicates get the status of their cluster's probe; those count as measured this run too.
+    # Resumed results were recorded in history and health by the interrupted run already.
+    for result in clusters.fan_out(fold.current(), channels, cluster_of):
+        if result['via'] in fresh:
+            fresh.add(result['id'])
+        stats.add(result)
+        fold.add(result)
+    
+    # Channels the deadline cut off keep their previous status, like backed-off ones.
+    # The fold updates last_status in place, but never for a channel it hasn't seen.
+    unprobed = [ch for ch in to_probe + skipped if ch['id'] not in fold.seen]
+    if unprobed:
+        print(f"\nStopped early: {len(unprobed)} channels not probed (run with --resume to finish them)")
+    deferred = [ch for ch in deferred if ch['id'] not in fold.seen] + [ch for ch in unprobed if ch['id'] in last_status]
+    for ch in deferred:
+        carried = dict(last_status[ch['id']], probed=False)
+        stats.add(carried)
+        fold.add(carried)
+    
+    with metrics.stage('write'):
+        entry, view = fold.commit(timings=timing_summary)
+        latest_file = run_log.write_latest(view)
+        history = StatusHistory()
+        run = history.append_run((view[channel_id] for channel_id in fresh), run_at=entry['run_at'])
+    
+    print(f"\nRun {entry['seq']} logged as {entry['kind']}: {entry['changed']} changed, {entry['removed']} removed")
+    print(f"Status written to {latest_file} (history run {run})")
     
     print(f"\nSummary:")
-    print(f"  Total: {stats['total']}")
-    print(f"  Live: {stats['live']}")
-    print(f"  Slow: {stats['slow']}")
-    print(f"  Dead: {stats['dead']}")
-    print(f"  Unstable: {stats['unstable']}")
-    print(f"  Browser restricted: {stats['browser_restricted']}")
+    print(f"  Total: {stats.total}")
+    print(f"  Live: {stats.statuses['live']}")
+    print(f"  Slow: {stats.statuses['slow']}")
+    print(f"  Dead: {stats.statuses['dead']}")
+    print(f"  Unstable: {stats.statuses['unstable']}")
+    print(f"  Browser restricted: {stats.browser_restricted}")
+    print(f"  Carried forward: {stats.carried}")
+    print(f"  Fanned out to duplicates: {stats.fanned}")
+    dns_stats = resolver.stats
+    print(f"  DNS: {dns_stats['hits']} cached, {dns_stats['misses']} looked up, "
+          f"{dns_stats['nxdomain']} NXDOMAIN, {dns_stats['errors']} failed"
+          + ("" if resolver.trust_nxdomain else " (NXDOMAIN answers ignored: resolver looks broken)"))
+    if cache:
+        cache_report = cache.report()
+        print(f"  Probe cache: {cache_report['hit_rate']:.1%} hit rate, {cache_report['hits']} hits, "
+              f"{cache_report['revalidated']} revalidated, {cache_report['misses']} probed, ~{cache_report['saved_seconds']}s saved")
+        for outcome in ('hits', 'revalidated', 'misses'):
+            metrics.set('probe_cache_lookups', cache_report[outcome], {'outcome': outcome})
+        metrics.set('probe_cache_saved_seconds', cache_report['saved_seconds'])
+    if redirects:
+        redirect_report = redirects.report()
+        print(f"  Redirect chains: " + (", ".join(f"{hops} hops: {n}" for hops, n in redirect_report['hops'].items()) or "no responses")
+              + f"; {redirect_report['shortcut']} probed at the cached final URL, {redirect_report['fallback']} fell back")
+        for hops, n in redirect_report['hops'].items():
+            metrics.set('redirect_chain_channels', n, {'hops': hops})
+        metrics.set('redirect_cache_fallbacks', redirect_report['fallback'])
+    
+    if timing_summary:
+        print(f"\nProbe phases (p50 / p95 / p99 ms):")
+        for phase, pcts in timing_summary.items():
+            print(f"  {phase[:-3]}: {pcts['p50']} / {pcts['p95']} / {pcts['p99']}")
     
     channels_by_id = {ch['id']: ch for ch in channels}
-    for result in results:
-        ch = channels_by_id.get(result['id'])
+    for channel_id in fresh:
+        ch = channels_by_id.get(channel_id)
         if ch:
-            update_health_score(ch, result['status'])
-            ch['browser_playable'] = result.get('browser_playable', True)
+            update_health_score(ch, view[channel_id]['status'])
+            ch['browser_playable'] = view[channel_id].get('browser_playable', True)
     
-    updated_channels = sorted(channels, key=lambda x: x['name'].lower())
-    with open(channels_file, 'w', encoding='utf-8') as f:
-        json.dump(updated_channels, f, indent=2, ensure_ascii=False)
+    with metrics.stage('analytics'):
+        analytics_report = analytics.compute(history, channels)
+        save_json(analytics_report, str(analytics.get_analytics_file()))
+    print(f"Analytics: {analytics_report['channels']} channels over {analytics_report['runs']} history runs")
+    
+    with metrics.stage('write'):
+        save_channels_json(channels, str(channels_file))
     
     print(f"Updated {channels_file}")
-    print(f"Browser restricted: {stats['browser_restricted']} / {stats['total']}")
+    if not unprobed:
+        checkpoint.discard()
+    
+    host_report = limiter.report()
+    save_json(host_report, str(root / 'data' / 'status' / 'hosts.json'))
+    print(f"\nHosts: {len(host_report)} (busiest first)")
+    for host, info in list(host_report.items())[:10]:
+        print(f"  {host}: {info['probes']} probes, max {info['max_concurrency']} concurrent, "
+              f"limit {info['limit']}, p50 {info['p50_ms']} ms, p95 {info['p95_ms']} ms, {info['errors']} errors")
+    print(f"Browser restricted: {stats.browser_restricted} / {stats.total}")
+    
+    metrics.set('run_channels', stats.total, {'kind': 'total'})
+    metrics.set('run_channels', stats.probed, {'kind': 'probed'})
+    metrics.set('run_channels', stats.carried, {'kind': 'carried'})
+    metrics.set('run_channels', stats.fanned, {'kind': 'fanned'})
+    metrics.set('run_channels', len(unprobed), {'kind': 'unprobed'})
+    print(f"Metrics written to {metrics.write()}")
     sys.exit(0)
 
 
@@ -0,0 +1,96 @@
+"""
+Checker run checkpoint and live result stream.
+
+While a run is probing, every finished result is appended to
+data/status/current.ndjson, so `tail -f` shows results as they land. The
+first line records the run and the ids it planned to probe:
+
+    {"run_at": "...", "planned": ["id", ...]}
+    {"id": "...", "status": "dead", ...}
+
+Lines are flushed to disk at least every FLUSH_SECONDS, so a killed run loses
+at most a second or so of probes. `check_streams.py --resume` reloads the
+file and probes only the planned ids without a result. A run that finishes
+discards its checkpoint.
+"""
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils import get_project_root
+import serialization
+
+
+FLUSH_SECONDS = 1
+
+
+def get_checkpoint_file() -> Path:
+    return get_project_root() / "data" / "status" / "current.ndjson"
+
+
+class Checkpoint:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_checkpoint_file()
+        self._file = None
+        self._flushed_at = 0.0
+    
+    def exists(self) -> bool:
+        return self.path.exists()
+    
+    def load(self) -> Tuple[Optional[Dict], Dict[str, Dict]]:
+        """(header, results by id); a torn last line from a kill is ignored."""
+        header = None
+        results = {}
+        if not self.path.exists():
+            return header, results
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = serialization.loads(line)
+                except ValueError:
+                    continue
+                if header is None:
+                    header = record
+                elif record.get('id'):
+                    results[record['id']] = record
+        return header, results
+    
+    def start(self, run_at: str, planned: List[str]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'run_at': run_at, 'planned': planned})
+        self.flush()
+    
+    def reopen(self):
+        """Keep appending to an existing checkpoint (resume)."""
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # A torn line left by a kill must not swallow the next record
+        if self.path.stat().st_size:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+    
+    def _write(self, record: Dict):
+        self._file.write(serialization.dumps_line(record))
+    
+    def add(self, result: Dict):
+        self._write(result)
+        if time.monotonic() - self._flushed_at >= FLUSH_SECONDS:
+            self.flush()
+    
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._flushed_at = time.monotonic()
+    
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+    
+    def discard(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
\ No newline at end of file
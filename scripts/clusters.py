@@ -0,0 +1,212 @@
+"""
+Near-duplicate stream clustering.
+
+Playlists list the same stream many times over: http and https, explicit
+default ports, trailing slashes, query parameters in a different order, or
+the same path on another CDN mirror. Channels are joined into one cluster
+(union-find) when they share either key:
+
+    url     the canonical URL (scheme-less, default port dropped, path
+            slashes collapsed, trailing slash dropped, query sorted)
+    mirror  tvg-id + normalized name + canonical path and query, any host
+
+Each cluster has a representative (healthiest, then https, then lowest id).
+The checker probes one member per cluster and fans its result out to the
+others. The map is saved to data/clusters.json:
+
+    {"clusters": [{"id": <representative>, "members": [<other ids>], ...}], ...}
+
+    python scripts/clusters.py
+"""
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from utils import generate_id, get_project_root, is_browser_playable, load_json, save_json
+from search_index import normalize_text
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def get_clusters_file() -> Path:
+    return get_project_root() / "data" / "clusters.json"
+
+
+def canonical_parts(url: str) -> Tuple[str, str]:
+    """(netloc, path?query) of the canonical form."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').rstrip('.')
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port in (None, DEFAULT_PORTS.get(parts.scheme.lower())) else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    path = re.sub(r'/{2,}', '/', parts.path or '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return netloc, path + (f'?{query}' if query else '')
+
+
+def canonical_url(url: str) -> str:
+    netloc, path = canonical_parts(url)
+    return f"//{netloc}{path}"
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+    
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+    
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def cluster_keys(channel: Dict) -> List[str]:
+    netloc, path = canonical_parts(channel['stream_url'])
+    keys = [generate_id(f"url|{netloc}{path}")]
+    name = normalize_text(channel.get('name') or '')
+    if name and path != '/':
+        tvg_id = (channel.get('tvg_id') or '').lower()
+        keys.append(generate_id(f"mirror|{tvg_id}|{name}|{path}"))
+    return keys
+
+
+def representative(members: List[Dict]) -> Dict:
+    return min(members, key=lambda ch: (-ch.get('health_score', 1.0), not ch['stream_url'].startswith('https://'), ch['id']))
+
+
+def build_clusters(channels: List[Dict]) -> List[Dict]:
+    """Clusters with more than one member, largest first."""
+    uf = UnionFind(len(channels))
+    first_with_key: Dict[str, int] = {}
+    for i, channel in enumerate(channels):
+        for key in cluster_keys(channel):
+            j = first_with_key.setdefault(key, i)
+            if j != i:
+                uf.union(i, j)
+    
+    groups: Dict[int, List[Dict]] = {}
+    for i, channel in enumerate(channels):
+        groups.setdefault(uf.find(i), []).append(channel)
+    
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        rep = representative(members)
+        clusters.append({
+            'id': rep['id'],
+            'name': rep.get('name'),
+            'canonical_url': canonical_url(rep['stream_url']),
+            'members': sorted(ch['id'] for ch in members if ch is not rep),
+        })
+    clusters.sort(key=lambda c: (-len(c['members']), c['id']))
+    return clusters
+
+
+def save_clusters(channels: List[Dict], path: Optional[Path] = None) -> Dict:
+    clusters = build_clusters(channels)
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'channels': len(channels),
+        'clusters': clusters,
+        'redundant': sum(len(c['members']) for c in clusters),
+    }
+    save_json(report, str(path or get_clusters_file()))
+    return report
+
+
+def load_cluster_map(path: Optional[Path] = None) -> Dict[str, str]:
+    """Channel id -> representative id, for every clustered channel."""
+    report = load_json(str(path or get_clusters_file())) or {}
+    cluster_of = {}
+    for cluster in report.get('clusters', []):
+        cluster_of[cluster['id']] = cluster['id']
+        for member in cluster['members']:
+            cluster_of[member] = cluster['id']
+    return cluster_of
+
+
+def pick_targets(to_probe: List[Dict], cluster_of: Dict[str, str]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    One channel per cluster to probe: the representative when it is due,
+    otherwise the first due member. Returns (targets, skipped members).
+    """
+    chosen: Dict[str, Dict] = {}
+    for channel in to_probe:
+        cluster = cluster_of.get(channel['id'])
+        if cluster is None:
+            continue
+        current = chosen.get(cluster)
+        if current is None or (channel['id'] == cluster and current['id'] != cluster):
+            chosen[cluster] = channel
+    targets, skipped = [], []
+    for channel in to_probe:
+        cluster = cluster_of.get(channel['id'])
+        if cluster is None or chosen[cluster] is channel:
+            targets.append(channel)
+        else:
+            skipped.append(channel)
+    return targets, skipped
+
+
+def fan_out(results: List[Dict], channels: List[Dict], cluster_of: Dict[str, str]) -> List[Dict]:
+    """
+    Results for clustered channels without one of their own, copied from
+    their cluster's result. Fanned results carry `via` and probed=False;
+    browser_playable is worked out for the member's own URL.
+    """
+    have = {r['id'] for r in results}
+    by_cluster = {}
+    for result in results:
+        cluster = cluster_of.get(result['id'])
+        if cluster is not None and not result.get('via'):
+            by_cluster.setdefault(cluster, result)
+    
+    fanned = []
+    for channel in channels:
+        cluster = cluster_of.get(channel['id'])
+        source = by_cluster.get(cluster) if cluster else None
+        if source is None or channel['id'] in have:
+            continue
+        result = {k: v for k, v in source.items() if k not in ('timings', 'bytes')}
+        result.update(id=channel['id'], name=channel['name'], stream_url=channel['stream_url'], via=source['id'], probed=False)
+        result['browser_playable'] = is_browser_playable(channel['stream_url'], result.get('http_code'), result['status'], result.get('content_type'))
+        fanned.append(result)
+    return fanned
+
+
+def main():
+    channels = load_json(str(get_project_root() / 'data' / 'channels.json'))
+    if not channels:
+        print("Error: No channels found")
+        sys.exit(1)
+    report = save_clusters(channels)
+    print(f"{len(report['clusters'])} clusters cover {report['redundant']} redundant channels of {report['channels']}")
+    for cluster in report['clusters'][:10]:
+        print(f"  {cluster['name']}: {len(cluster['members']) + 1} streams ({cluster['canonical_url']})")
+    print(f"Written to {get_clusters_file()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+Long-running checker: python scripts/check_streams.py --serve
+
+Keeps one event loop, connection pool, resolver and the probe caches alive
+and probes continuously instead of in one burst per run. Every channel is
+probed once per cycle (--cycle, default one run interval), or less often
+while the scheduler backs it off. Each channel's first probe sits at a fixed
+point of the cycle derived from its id, so probes spread evenly and the rate
+stays at about channels / cycle. Duplicate clusters are probed once, as in a
+normal run.
+
+Results are held in memory and flushed every FLUSH_EVERY seconds the way a
+checker run writes them: a run-log entry and latest.json, the history store,
+analytics, channels.json, hosts.json, the caches and metrics. When something
+else (the scraper) rewrites channels.json the catalog is reloaded, keeping
+the health fields the daemon has updated since its last flush.
+
+A local HTTP API answers from the in-memory state:
+
+    GET /status          counts by status, probe rate, flush and cache stats
+    GET /channel/{id}    catalog record, latest result, next probe
+    GET /metrics         Prometheus text
+"""
+import asyncio
+import heapq
+import signal
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from utils import generate_id, get_project_root, load_json, save_json, save_channels_json, update_health_score
+from status_store import StatusHistory
+from host_limiter import HostLimiter, host_key
+from metrics import RunMetrics
+import analytics
+import check_streams
+import clusters
+import dns_cache
+import hls_probe
+import probe_cache
+import probe_trace
+import redirect_cache
+import run_log
+import scheduler
+import serialization
+
+
+FLUSH_EVERY = 5 * 60
+RELOAD_EVERY = 60
+# A channel whose host is at its limit is retried this much later
+BUSY_RETRY = 1.0
+DRAIN_TIMEOUT = 10
+HEALTH_FIELDS = ('health_score', 'fail_streak', 'last_checked', 'last_seen', 'browser_playable', 'stats')
+
+
+def cycle_phase(channel_id: str) -> float:
+    """A channel's fixed position in the cycle, in [0, 1)."""
+    return int(generate_id(channel_id)[:8], 16) / 0x100000000
+
+
+def json_response(data, status: int = 200) -> web.Response:
+    return web.Response(body=serialization.dumps(data), status=status, content_type='application/json')
+
+
+class StatusDaemon:
+    def __init__(self, cycle: float, max_workers: int = 256, deep: bool = False, deep_budget: int = hls_probe.DEEP_BYTE_BUDGET,
+                 all_members: bool = False, use_probe_cache: bool = True, use_redirect_cache: bool = True, flush_every: float = FLUSH_EVERY):
+        root = get_project_root()
+        self.channels_file = root / 'data' / 'channels.json'
+        self.hosts_file = root / 'data' / 'status' / 'hosts.json'
+        self.cycle = cycle
+        self.max_workers = max_workers
+        self.deep = deep
+        self.deep_budget = deep_budget
+        self.all_members = all_members
+        self.flush_every = flush_every
+        
+        self.metrics = RunMetrics('daemon')
+        self.limiter = HostLimiter(global_limit=max_workers)
+        self.resolver = dns_cache.CachingResolver()
+        self.cache = probe_cache.ProbeCache() if use_probe_cache and not deep else None
+        self.redirects = redirect_cache.RedirectCache() if use_redirect_cache else None
+        self.history = StatusHistory()
+        self.phases = probe_trace.PhaseStats()
+        
+        self.previous = run_log.materialize()
+        self.status: Dict[str, Dict] = dict(self.previous[0])
+        self.pending: Dict[str, Dict] = {}
+        self.channels: Dict[str, Dict] = {}
+        self.cluster_of: Dict[str, str] = {}
+        self.members: Dict[str, List[Dict]] = {}
+        self.targets: set = set()
+        self.due: List[Tuple[float, str]] = []
+        self.next_due: Dict[str, float] = {}
+        self.tasks: set = set()
+        self.catalog_mtime = None
+        self.last_flush = None
+        self.probes = 0
+        self.stop: Optional[asyncio.Event] = None
+    
+    def _catalog_changed(self) -> bool:
+        try:
+            return self.channels_file.stat().st_mtime_ns != self.catalog_mtime
+        except FileNotFoundError:
+            return False
+    
+    def load_catalog(self):
+        channels = load_json(str(self.channels_file)) or []
+        self.catalog_mtime = self.channels_file.stat().st_mtime_ns if self.channels_file.exists() else None
+        # Health updated since the last flush is newer than what is on disk
+        for ch in channels:
+            known = self.channels.get(ch['id'])
+            if known is not None and known['stream_url'] == ch['stream_url']:
+                ch.update({field: known[field] for field in HEALTH_FIELDS if field in known})
+        self.channels = {ch['id']: ch for ch in channels}
+        
+        self.cluster_of = {} if self.all_members else clusters.load_cluster_map()
+        targets, skipped = clusters.pick_targets(channels, self.cluster_of)
+        self.members = {}
+        for ch in skipped:
+            self.members.setdefault(self.cluster_of[ch['id']], []).append(ch)
+        self.targets = {ch['id'] for ch in targets}
+        
+        now = time.monotonic()
+        for ch in targets:
+            if ch['id'] not in self.next_due:
+                self.schedule(ch['id'], now + cycle_phase(ch['id']) * self.cycle)
+        for channel_id in list(self.next_due):
+            if channel_id not in self.targets:
+                del self.next_due[channel_id]
+    
+    def schedule(self, channel_id: str, at: float):
+        # Superseded heap entries are skipped when they come up
+        self.next_due[channel_id] = at
+        heapq.heappush(self.due, (at, channel_id))
+    
+    def interval(self, channel: Dict) -> float:
+        return max(self.cycle, scheduler.probe_interval(channel).total_seconds())
+    
+    async def _sleep(self, seconds: float):
+        """Sleep, waking early on shutdown."""
+        try:
+            await asyncio.wait_for(self.stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def dispatch(self, session: aiohttp.ClientSession):
+        while not self.stop.is_set():
+            if not self.due:
+                await self._sleep(RELOAD_EVERY)
+                continue
+            at, channel_id = self.due[0]
+            delay = at - time.monotonic()
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+            heapq.heappop(self.due)
+            if self.next_due.get(channel_id) == at:
+                self.start_probe(session, self.channels[channel_id])
+            # Keep the API responsive while a backlog of due channels drains
+            await asyncio.sleep(0)
+    
+    def start_probe(self, session: aiohttp.ClientSession, ch: Dict):
+        cached = self.cache.lookup(ch) if self.cache else None
+        if cached:
+            self.on_result(ch, cached)
+            return
+        host = host_key(ch['stream_url'])
+        if len(self.tasks) >= self.max_workers or not self.limiter.try_acquire(host):
+            self.schedule(ch['id'], time.monotonic() + BUSY_RETRY)
+            return
+        task = asyncio.ensure_future(self.probe(session, ch, host))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    async def probe(self, session: aiohttp.ClientSession, ch: Dict, host: str):
+        timings = probe_trace.new_timings()
+        start = time.monotonic()
+        try:
+            result = await check_streams.probe_channel(session, ch, self.deep, self.deep_budget, timings, self.cache, self.redirects)
+            self.limiter.record(host, (time.monotonic() - start) * 1000, result.get('http_code'))
+        finally:
+            self.limiter.release(host)
+        # The catalog may have been reloaded while the probe ran
+        current = self.channels.get(ch['id'])
+        if current is not None:
+            self.on_result(current, result)
+    
+    def on_result(self, ch: Dict, result: Dict):
+        if ch['id'] in self.targets:
+            self.schedule(ch['id'], time.monotonic() + self.interval(ch))
+        if result.get('cached') == 'hit':
+            # Nothing was measured: no health update and no history row
+            result['probed'] = False
+            self.status.setdefault(ch['id'], result)
+            return
+        result['probed'] = True
+        self.probes += 1
+        self.phases.add(result.get('timings'))
+        self.metrics.inc('probes_total', labels={'status': result['status'], 'http_code': result.get('http_code') or 0})
+        self.metrics.inc('bytes_downloaded_total', result.get('bytes') or 0)
+        for r in [result] + clusters.fan_out([result], self.members.get(ch['id'], []), self.cluster_of):
+            channel = self.channels.get(r['id'])
+            if channel is not None:
+                update_health_score(channel, r['status'])
+                channel['browser_playable'] = r.get('browser_playable', True)
+            self.status[r['id']] = r
+            self.pending[r['id']] = r
+    
+    def flush(self):
+        """Persist everything probed since the last flush."""
+        if not self.pending:
+            return
+        results = [r for channel_id, r in self.status.items() if channel_id in self.channels]
+        with self.metrics.stage('write'):
+            entry, view = run_log.append_run(results, previous=self.previous, timings=self.phases.summary())
+            _, state = self.previous
+            self.previous = (view, {
+                'seq': entry['seq'],
+                'since_snapshot': 0 if entry['kind'] == 'snapshot' else state['since_snapshot'] + 1,
+                'last_file': f"{entry['run_at'][:10]}.ndjson",
+            })
+            run_log.write_latest({r['id']: r for r in results})
+            self.history.append_run(list(self.pending.values()), run_at=entry['run_at'])
+        
+        channels = list(self.channels.values())
+        with self.metrics.stage('analytics'):
+            save_json(analytics.compute(self.history, channels), str(analytics.get_analytics_file()))
+        
+        with self.metrics.stage('write'):
+            save_channels_json(channels, str(self.channels_file))
+            self.catalog_mtime = self.channels_file.stat().st_mtime_ns
+            save_json(self.limiter.report(), str(self.hosts_file))
+            self.resolver.save()
+            if self.cache:
+                self.cache.save()
+            if self.redirects:
+                self.redirects.save()
+        
+        print(f"Flushed {len(self.pending)} results as run {entry['seq']} ({entry['kind']}, {entry['changed']} changed)", flush=True)
+        self.pending = {}
+        self.phases = probe_trace.PhaseStats()
+        self.last_flush = entry['run_at']
+        self.update_gauges()
+        self.metrics.write()
+    
+    async def housekeeping(self):
+        last_flush = time.monotonic()
+        while not self.stop.is_set():
+            await self._sleep(min(RELOAD_EVERY, self.flush_every))
+            if self._catalog_changed():
+                self.load_catalog()
+                print(f"Reloaded {self.channels_file}: {len(self.channels)} channels", flush=True)
+            if time.monotonic() - last_flush >= self.flush_every:
+                self.flush()
+                last_flush = time.monotonic()
+    
+    def status_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for channel_id in self.channels:
+            record = self.status.get(channel_id)
+            status = record.get('status', 'unknown') if record else 'unknown'
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+    
+    def update_gauges(self):
+        for status, n in self.status_counts().items():
+            self.metrics.set('daemon_channels', n, {'status': status})
+        self.metrics.set('run_channels', len(self.channels), {'kind': 'total'})
+        self.metrics.set('run_channels', len(self.targets), {'kind': 'probed'})
+        self.metrics.set('daemon_in_flight', len(self.tasks))
+        self.metrics.set('daemon_pending_results', len(self.pending))
+    
+    async def handle_status(self, request: web.Request) -> web.Response:
+        return json_response({
+            'channels': len(self.channels),
+            'probed_channels': len(self.targets),
+            'statuses': self.status_counts(),
+            'cycle_seconds': self.cycle,
+            'probe_rate_per_second': round(len(self.targets) / self.cycle, 2),
+            'probes': self.probes,
+            'in_flight': len(self.tasks),
+            'pending_results': len(self.pending),
+            'last_flush': self.last_flush,
+            'uptime_seconds': round(time.monotonic() - self.metrics.started, 1),
+            'probe_cache': self.cache.report() if self.cache else None,
+            'redirects': self.redirects.report() if self.redirects else None,
+        })
+    
+    async def handle_channel(self, request: web.Request) -> web.Response:
+        channel_id = request.match_info['id']
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return json_response({'error': f"unknown channel {channel_id}"}, status=404)
+        probed_as = channel_id if channel_id in self.targets else self.cluster_of.get(channel_id, channel_id)
+        next_due = self.next_due.get(probed_as)
+        return json_response({
+            'channel': channel,
+            'status': self.status.get(channel_id),
+            'probed_as': probed_as,
+            'next_probe_in_seconds': round(max(0.0, next_due - time.monotonic()), 1) if next_due is not None else None,
+        })
+    
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        self.update_gauges()
+        return web.Response(text=self.metrics.to_prometheus(), content_type='text/plain', charset='utf-8')
+    
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/status', self.handle_status)
+        app.router.add_get('/channel/{id}', self.handle_channel)
+        app.router.add_get('/metrics', self.handle_metrics)
+        return app
+    
+    async def run(self, bind: str, port: int):
+        self.stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        self.load_catalog()
+        if not self.channels:
+            print(f"Error: No channels found in {self.channels_file}")
+            return
+        await self.resolver.prefetch(dns_cache.unique_hosts(ch.get('stream_url') for ch in self.channels.values()))
+        
+        runner = web.AppRunner(self.build_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, bind, port).start()
+        print(f"Serving http://{bind}:{port}/status: {len(self.targets)} of {len(self.channels)} channels "
+              f"every {self.cycle:.0f}s (~{len(self.targets) / self.cycle:.1f} probes/s), flushing every {self.flush_every:.0f}s", flush=True)
+        
+        try:
+            async with check_streams.open_session(self.max_workers, self.resolver) as session, self.metrics.loop_lag():
+                loops = [asyncio.ensure_future(self.dispatch(session)), asyncio.ensure_future(self.housekeeping())]
+                await self.stop.wait()
+                await asyncio.gather(*loops, return_exceptions=True)
+                # Let in-flight probes finish briefly; the rest are probed again next start
+                if self.tasks:
+                    await asyncio.wait(list(self.tasks), timeout=DRAIN_TIMEOUT)
+                for task in list(self.tasks):
+                    task.cancel()
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+        finally:
+            await runner.cleanup()
+            self.flush()
+            await self.resolver.close()
+        print("Stopped", flush=True)
+
+
+def serve(args):
+    daemon = StatusDaemon(args.cycle, args.max_workers, args.deep, args.deep_budget, all_members=args.all_members,
+                          use_probe_cache=not args.no_probe_cache, use_redirect_cache=not args.no_redirect_cache,
+                          flush_every=args.flush_every)
+    asyncio.run(daemon.run(args.bind, args.port))
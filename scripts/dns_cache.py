@@ -0,0 +1,209 @@
+"""
+DNS pre-resolution and a persistent resolver cache for the stream checker.
+
+Before probing, every unique hostname in the catalog is resolved once, up to
+RESOLVE_CONCURRENCY at a time. Answers are kept in data/cache/dns.json for
+their TTL (clamped to MIN_TTL..MAX_TTL), so the next run starts warm.
+CachingResolver serves the probes' connector from the same cache. Hosts that
+come back NXDOMAIN are cached for the short NXDOMAIN_TTL and the checker
+marks their channels dead without an HTTP attempt. Negative answers are
+never written to dns.json: one transient resolver failure must not mark a
+host dead for the following runs.
+
+aiodns is used when installed: it is truly async and reports record TTLs.
+Without it lookups fall back to the loop's threaded getaddrinfo with
+DEFAULT_TTL.
+"""
+import asyncio
+import ipaddress
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from aiohttp.abc import AbstractResolver
+
+from utils import get_project_root, load_json, save_json
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
+
+MIN_TTL = 300
+MAX_TTL = 6 * 3600
+DEFAULT_TTL = 3600
+NXDOMAIN_TTL = 5 * 60
+RESOLVE_CONCURRENCY = 128
+RESOLVE_TIMEOUT = 5
+# If most hosts of a run are NXDOMAIN the resolver itself is broken (sandbox,
+# captive network); don't trust or cache those answers
+NXDOMAIN_SANITY_FRACTION = 0.5
+NXDOMAIN_SANITY_MIN_HOSTS = 10
+
+
+class NXDomainError(OSError):
+    pass
+
+
+def get_dns_cache_file() -> Path:
+    return get_project_root() / "data" / "cache" / "dns.json"
+
+
+def url_hostname(url: str) -> Optional[str]:
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    try:
+        ipaddress.ip_address(host)
+        return None
+    except ValueError:
+        return host.rstrip('.').lower()
+
+
+def unique_hosts(urls: Iterable[str]) -> List[str]:
+    """Distinct DNS names (IP literals excluded) in first-seen order."""
+    seen = {}
+    for url in urls:
+        host = url_hostname(url or '')
+        if host:
+            seen.setdefault(host, None)
+    return list(seen)
+
+
+class CachingResolver(AbstractResolver):
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_dns_cache_file()
+        self.cache: Dict[str, Dict] = {h: e for h, e in (load_json(str(self.path)) or {}).items() if not e.get('nxdomain')}
+        self.trust_nxdomain = True
+        self.stats = {'hits': 0, 'misses': 0, 'nxdomain': 0, 'errors': 0}
+        self._dns = None
+        self._pending: Dict[str, asyncio.Future] = {}
+    
+    def _fresh(self, host: str) -> Optional[Dict]:
+        entry = self.cache.get(host)
+        if entry and entry['expires'] > time.time():
+            return entry
+        return None
+    
+    async def _lookup(self, host: str) -> Dict:
+        now = time.time()
+        try:
+            if aiodns is not None:
+                # Created lazily so it binds to the loop that runs the probes
+                if self._dns is None:
+                    self._dns = aiodns.DNSResolver(timeout=RESOLVE_TIMEOUT, tries=2)
+                result = await self._dns.getaddrinfo(host, family=socket.AF_UNSPEC, type=socket.SOCK_STREAM)
+                addrs = [[node.addr[0].decode('ascii'), int(node.family)] for node in result.nodes]
+                ttl = min((node.ttl for node in result.nodes), default=0) or DEFAULT_TTL
+            else:
+                infos = await asyncio.wait_for(
+                    asyncio.get_running_loop().getaddrinfo(host, 0, type=socket.SOCK_STREAM),
+                    RESOLVE_TIMEOUT * 2)
+                addrs = [[info[4][0], int(info[0])] for info in infos]
+                ttl = DEFAULT_TTL
+        except Exception as e:
+            if self._is_nxdomain_error(e):
+                self.stats['nxdomain'] += 1
+                return {'addrs': [], 'nxdomain': True, 'expires': now + NXDOMAIN_TTL}
+            raise
+        if not addrs:
+            raise OSError(f"no addresses for {host}")
+        # Deduplicate while keeping the resolver's preference order
+        addrs = [list(a) for a in dict.fromkeys(tuple(a) for a in addrs)]
+        return {'addrs': addrs, 'expires': now + max(MIN_TTL, min(MAX_TTL, ttl))}
+    
+    @staticmethod
+    def _is_nxdomain_error(error: Exception) -> bool:
+        if aiodns is not None and isinstance(error, aiodns.error.DNSError):
+            return bool(error.args) and error.args[0] == aiodns.error.ARES_ENOTFOUND
+        return isinstance(error, socket.gaierror) and error.errno == socket.EAI_NONAME
+    
+    async def _resolve_entry(self, host: str) -> Dict:
+        entry = self._fresh(host)
+        if entry is not None:
+            self.stats['hits'] += 1
+            return entry
+        # Concurrent probes of one host share a single lookup
+        pending = self._pending.get(host)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[host] = future
+        try:
+            entry = await self._lookup(host)
+            if not entry.get('nxdomain') or self.trust_nxdomain:
+                self.cache[host] = entry
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            self.stats['errors'] += 1
+            future.set_exception(e)
+            # Retrieve it so an unawaited future doesn't warn
+            future.exception()
+            raise
+        finally:
+            del self._pending[host]
+    
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict]:
+        entry = await self._resolve_entry(host.rstrip('.').lower())
+        if entry.get('nxdomain'):
+            raise NXDomainError(socket.EAI_NONAME, f"NXDOMAIN: {host}")
+        results = [
+            {
+                'hostname': host,
+                'host': addr,
+                'port': port,
+                'family': addr_family,
+                'proto': 0,
+                'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+            }
+            for addr, addr_family in entry['addrs']
+            if family in (socket.AF_UNSPEC, addr_family)
+        ]
+        if not results:
+            raise OSError(f"no addresses for {host} in family {family}")
+        return results
+    
+    async def prefetch(self, hosts: Iterable[str]) -> Dict[str, str]:
+        """
+        Resolve hosts concurrently; returns {host: 'ok' | 'nxdomain' | 'error'}.
+        Cached answers are reused without a lookup.
+        """
+        hosts = list(hosts)
+        semaphore = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+        
+        async def one(host):
+            async with semaphore:
+                try:
+                    entry = await self._resolve_entry(host)
+                except Exception:
+                    return 'error'
+                return 'nxdomain' if entry.get('nxdomain') else 'ok'
+        
+        outcomes = dict(zip(hosts, await asyncio.gather(*(one(h) for h in hosts))))
+        
+        nxdomain = [h for h, outcome in outcomes.items() if outcome == 'nxdomain']
+        if len(hosts) >= NXDOMAIN_SANITY_MIN_HOSTS and len(nxdomain) > NXDOMAIN_SANITY_FRACTION * len(hosts):
+            self.trust_nxdomain = False
+            for host in nxdomain:
+                self.cache.pop(host, None)
+                outcomes[host] = 'error'
+        return outcomes
+    
+    def save(self):
+        now = time.time()
+        save_json({h: e for h, e in sorted(self.cache.items()) if e['expires'] > now and not e.get('nxdomain')}, str(self.path))
+    
+    async def close(self):
+        if self._dns is not None and hasattr(self._dns, 'close'):
+            # close() became a coroutine in aiodns 4
+            closing = self._dns.close()
+            if asyncio.iscoroutine(closing):
+                await closing
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+HLS-aware deep probe.
+
+Walks master playlist -> variant -> media playlist -> live-edge segments and
+measures how fast segment bytes actually arrive compared to the variant's
+declared BANDWIDTH. Every request shares one byte budget per channel, so a
+deep probe never downloads more than DEEP_BYTE_BUDGET bytes.
+
+A segment body cut short (byte budget or SEGMENT_TIMEOUT) only counts
+towards the bitrate estimate when its Content-Length is known. One that was
+still arriving after longer than its own duration caps the throughput ratio
+below 1, so it can't be graded 'live'.
+"""
+import math
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import aiohttp
+
+
+DEEP_BYTE_BUDGET = 2 * 1024 * 1024
+PLAYLIST_LIMIT = 256 * 1024
+SEGMENTS_TO_FETCH = 2
+SEGMENT_TIMEOUT = 10
+
+STREAM_INF_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def is_hls(url: str, content_type: str) -> bool:
+    content_type = (content_type or '').lower()
+    return '.m3u8' in url.lower() or 'mpegurl' in content_type
+
+
+def parse_master_playlist(text: str, base_url: str) -> List[Dict]:
+    """Variants from #EXT-X-STREAM-INF tags, each with bandwidth and absolute url."""
+    variants = []
+    pending = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attrs = dict(STREAM_INF_ATTR_RE.findall(line[18:]))
+            try:
+                bandwidth = int(attrs.get('BANDWIDTH', '0'))
+            except ValueError:
+                bandwidth = 0
+            pending = {'bandwidth': bandwidth, 'resolution': attrs.get('RESOLUTION')}
+        elif pending is not None and line and not line.startswith('#'):
+            pending['url'] = urljoin(base_url, line)
+            variants.append(pending)
+            pending = None
+    return variants
+
+
+def parse_media_playlist(text: str, base_url: str) -> List[Tuple[float, str]]:
+    """(duration, absolute url) for every segment in a media playlist."""
+    segments = []
+    duration = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith('#EXTINF:'):
+            try:
+                duration = float(line[8:].split(',', 1)[0])
+            except ValueError:
+                duration = 0.0
+        elif duration is not None and line and not line.startswith('#'):
+            segments.append((duration, urljoin(base_url, line)))
+            duration = None
+    return segments
+
+
+def pick_variant(variants: List[Dict]) -> Optional[Dict]:
+    """The lowest declared bandwidth: if that can't be sustained, nothing can."""
+    declared = [v for v in variants if v['bandwidth'] > 0]
+    if declared:
+        return min(declared, key=lambda v: v['bandwidth'])
+    return variants[0] if variants else None
+
+
+async def fetch_limited(session: aiohttp.ClientSession, url: str, headers: Dict, limit: int, timeout: float) -> Tuple[int, bytes, str, float, Optional[int], bool]:
+    """
+    GET at most `limit` bytes, stopping early once `timeout` seconds have
+    passed so a slow body still yields a partial throughput sample.
+    Returns (http status, body, final url, seconds, Content-Length, truncated),
+    where truncated means the body was cut at the byte limit or the timeout.
+    """
+    start = time.monotonic()
+    chunks = []
+    total = 0
+    truncated = False
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    async with session.get(url, headers=headers, timeout=client_timeout, allow_redirects=True) as resp:
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            chunks.append(chunk)
+            total += len(chunk)
+            if total >= limit or time.monotonic() - start >= timeout:
+                truncated = not resp.content.at_eof()
+                break
+        return resp.status, b''.join(chunks)[:limit], str(resp.url), time.monotonic() - start, resp.content_length, truncated or total > limit
+
+
+async def deep_probe(session: aiohttp.ClientSession, url: str, headers: Optional[Dict] = None, byte_budget: int = DEEP_BYTE_BUDGET) -> Dict:
+    headers = headers or {}
+    result = {
+        'variant_bandwidth': None,
+        'measured_bps': None,
+        'throughput_ratio': None,
+        'segments': 0,
+        'bytes': 0,
+        'error': None,
+    }
+    budget = byte_budget
+    
+    try:
+        status, body, final_url, _, _, _ = await fetch_limited(session, url, headers, min(PLAYLIST_LIMIT, budget), 8)
+        budget -= len(body)
+        if status >= 400:
+            result['error'] = f'playlist http {status}'
+            return result
+        text = body.decode('utf-8', errors='replace')
+        
+        if '#EXT-X-STREAM-INF' in text:
+            variant = pick_variant(parse_master_playlist(text, final_url))
+            if not variant:
+                result['error'] = 'no variants'
+                return result
+            result['variant_bandwidth'] = variant['bandwidth'] or None
+            status, body, final_url, _, _, _ = await fetch_limited(session, variant['url'], headers, min(PLAYLIST_LIMIT, budget), 8)
+            budget -= len(body)
+            if status >= 400:
+                result['error'] = f'media playlist http {status}'
+                return result
+            text = body.decode('utf-8', errors='replace')
+        
+        segments = parse_media_playlist(text, final_url)
+        if not segments:
+            result['error'] = 'no segments'
+            return result
+        
+        # Live edge: the newest segments are the ones a player would request
+        fetched_bytes = 0
+        elapsed = 0.0
+        whole_bytes = 0
+        media_seconds = 0.0
+        lagging_ratio = None
+        for duration, segment_url in segments[-SEGMENTS_TO_FETCH:]:
+            if budget <= 0:
+                break
+            per_segment = budget // SEGMENTS_TO_FETCH if result['segments'] == 0 else budget
+            status, body, _, seconds, length, truncated = await fetch_limited(session, segment_url, headers, per_segment, SEGMENT_TIMEOUT)
+            if status >= 400 or not body:
+                result['error'] = f'segment http {status}'
+                break
+            budget -= len(body)
+            fetched_bytes += len(body)
+            elapsed += seconds
+            result['segments'] += 1
+            # Full segment size (downloaded or declared) over its duration gives its bitrate
+            if not truncated or length:
+                whole_bytes += length or len(body)
+                media_seconds += duration
+            elif len(body) < per_segment and duration and seconds > duration:
+                # Still arriving after longer than it plays, so the link delivers under duration/seconds of what playback needs
+                bound = math.floor(duration / seconds * 100) / 100
+                lagging_ratio = bound if lagging_ratio is None else min(lagging_ratio, bound)
+        
+        if not fetched_bytes or elapsed <= 0:
+            if not result['error']:
+                result['error'] = 'no segment data'
+            return result
+        
+        measured_bps = fetched_bytes * 8 / elapsed
+        result['measured_bps'] = round(measured_bps)
+        
+        # Without a master playlist, estimate the bitrate from whole segments
+        required_bps = result['variant_bandwidth']
+        if not required_bps and media_seconds > 0:
+            required_bps = whole_bytes * 8 / media_seconds
+        if required_bps:
+            result['throughput_ratio'] = round(measured_bps / required_bps, 2)
+        if lagging_ratio is not None:
+            ratio = result['throughput_ratio']
+            result['throughput_ratio'] = lagging_ratio if ratio is None else min(ratio, lagging_ratio)
+    except Exception as e:
+        result['error'] = type(e).__name__
+    finally:
+        result['bytes'] = byte_budget - budget
+    
+    return result
+
+
+def classify_deep(status: str, deep: Dict) -> str:
+    """
+    Re-grade a reachable stream from deep-probe evidence: 'live' if segments
+    arrive at least as fast as the variant plays, 'slow' if they can't
+    sustain playback, 'unstable' if no segment could be fetched.
+    """
+    if status == 'dead':
+        return status
+    if not deep.get('segments'):
+        return 'unstable'
+    ratio = deep.get('throughput_ratio')
+    if ratio is None:
+        return status
+    return 'live' if ratio >= 1.0 else 'slow'
@@ -0,0 +1,128 @@
+"""
+Per-host adaptive concurrency for the stream checker.
+
+Each host (netloc) gets its own FIFO queue and an AIMD concurrency limit.
+The limit grows by one slot per successful probe until the host first shows
+congestion (slow start), then by roughly one slot per window, and halves
+when a host that has answered before starts timing out, returning 429/5xx
+or answering well above its own best latency. The checker's worker pool
+caps the total number of probes in flight across all hosts (global_limit).
+
+The limiter never blocks: the dispatcher asks try_acquire() for a slot and
+parks the host's channels until `on_available` reports the host can take
+another probe.
+"""
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from utils import Histogram
+
+
+GLOBAL_LIMIT = 256
+INITIAL_PER_HOST = 2
+MIN_PER_HOST = 2
+MAX_PER_HOST = 16
+# A probe is "slow" for its host when it exceeds both the floor and a multiple
+# of the fastest probe seen on that host, so uniformly slow hosts aren't punished
+LATENCY_FLOOR_MS = 1000
+LATENCY_FACTOR = 3
+CONGESTION_CODES = {429, 502, 503, 504}
+
+
+def host_key(url: str) -> str:
+    try:
+        return urlsplit(url).netloc.lower() or 'unknown'
+    except ValueError:
+        return 'unknown'
+
+
+class HostState:
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.active = 0
+        self.max_active = 0
+        self.probes = 0
+        self.errors = 0
+        self.answered = False
+        self.since_decrease = 0
+        self.slow_start = True
+        self.latencies = Histogram()
+        self.best_latency = None
+
+
+class HostLimiter:
+    def __init__(self, global_limit: int = GLOBAL_LIMIT, initial: float = INITIAL_PER_HOST,
+                 min_per_host: float = MIN_PER_HOST, max_per_host: float = MAX_PER_HOST,
+                 latency_floor_ms: float = LATENCY_FLOOR_MS):
+        self.global_limit = global_limit
+        self.initial = initial
+        self.min_per_host = min_per_host
+        self.max_per_host = max_per_host
+        self.latency_floor_ms = latency_floor_ms
+        self.on_available: Optional[Callable[[str], None]] = None
+        self._hosts: Dict[str, HostState] = {}
+    
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.initial)
+        return state
+    
+    def try_acquire(self, host: str) -> bool:
+        """Take a slot for one probe on `host` if its limit allows."""
+        state = self._state(host)
+        if state.active >= int(state.limit):
+            return False
+        state.active += 1
+        state.max_active = max(state.max_active, state.active)
+        return True
+    
+    def release(self, host: str):
+        state = self._state(host)
+        state.active -= 1
+        self._notify(host, state)
+    
+    def _notify(self, host: str, state: HostState):
+        if self.on_available and state.active < int(state.limit):
+            self.on_available(host)
+    
+    def record(self, host: str, latency_ms: float, http_code: Optional[int]):
+        """Feed one probe outcome back into the host's AIMD limit."""
+        state = self._state(host)
+        state.probes += 1
+        state.since_decrease += 1
+        state.latencies.add(latency_ms)
+        
+        answered = bool(http_code) and http_code not in CONGESTION_CODES
+        slow = state.best_latency is not None and latency_ms > max(self.latency_floor_ms, LATENCY_FACTOR * state.best_latency)
+        congested = not answered or slow
+        if answered:
+            state.answered = True
+            if state.best_latency is None or latency_ms < state.best_latency:
+                state.best_latency = latency_ms
+        
+        if congested:
+            state.errors += 1
+            # Only back off hosts that have shown they are alive, and at most
+            # once per window, so one burst of timeouts doesn't collapse the limit
+            if state.answered and state.since_decrease >= int(state.limit):
+                state.limit = max(self.min_per_host, state.limit / 2)
+                state.since_decrease = 0
+                state.slow_start = False
+        else:
+            step = 1 if state.slow_start else 1 / state.limit
+            state.limit = min(self.max_per_host, state.limit + step)
+            self._notify(host, state)
+    
+    def report(self) -> Dict[str, Dict]:
+        return {
+            host: {
+                'probes': state.probes,
+                'errors': state.errors,
+                'limit': round(state.limit, 2),
+                'max_concurrency': state.max_active,
+                'p50_ms': state.latencies.percentile(50),
+                'p95_ms': state.latencies.percentile(95),
+            }
+            for host, state in sorted(self._hosts.items(), key=lambda item: -item[1].probes)
+        }
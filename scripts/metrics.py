@@ -0,0 +1,172 @@
+"""
+Run metrics for the scraper and the checker.
+
+Each entry point fills one RunMetrics with stage durations, counters and
+event-loop lag samples, then writes it next to the status output:
+
+    data/status/metrics/<job>.prom   Prometheus textfile (node_exporter textfile collector)
+    data/status/metrics/<job>.json   the same numbers as a JSON run report
+
+Metric names are prefixed with "ciw_" (Click India Watch).
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils import Histogram, get_project_root, save_json
+import serialization
+
+
+PREFIX = 'ciw_'
+LAG_INTERVAL = 0.25
+LAG_QUANTILES = (50, 90, 99)
+
+HELP = {
+    'stage_seconds': ('gauge', "Wall-clock duration of a run stage"),
+    'source_fetch_seconds': ('gauge', "Time to fetch one playlist source"),
+    'source_parse_seconds': ('gauge', "Time to parse one playlist source"),
+    'source_channels': ('gauge', "Channels parsed from one playlist source"),
+    'probes_total': ('counter', "Stream probes by outcome"),
+    'bytes_downloaded_total': ('counter', "Response body bytes downloaded"),
+    'run_channels': ('gauge', "Channels in the run"),
+    'probe_cache_lookups': ('gauge', "Probe cache outcomes in the run"),
+    'probe_cache_saved_seconds': ('gauge', "Estimated probe time saved by the probe cache"),
+    'redirect_chain_channels': ('gauge', "Probed channels by redirect chain length"),
+    'daemon_channels': ('gauge', "Catalog channels by latest status, in daemon mode"),
+    'daemon_in_flight': ('gauge', "Probes in flight, in daemon mode"),
+    'daemon_pending_results': ('gauge', "Results not yet flushed to disk, in daemon mode"),
+    'redirect_cache_fallbacks': ('gauge', "Cached final URLs that failed and were re-walked from the original"),
+    'loop_lag_seconds': ('summary', "Event-loop scheduling lag"),
+    'run_duration_seconds': ('gauge', "Wall-clock duration of the whole run"),
+    'run_timestamp_seconds': ('gauge', "Unix time the run finished"),
+}
+
+
+def get_metrics_dir() -> Path:
+    return get_project_root() / "data" / "status" / "metrics"
+
+
+def _label_key(labels: Optional[Dict]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class RunMetrics:
+    def __init__(self, job: str):
+        self.job = job
+        self.started = time.monotonic()
+        self.values: Dict[str, Dict[Tuple, float]] = {}
+        self.lag = Histogram()
+        self.lag_max = 0.0
+        self.lag_sum = 0.0
+    
+    def set(self, name: str, value: float, labels: Optional[Dict] = None):
+        self.values.setdefault(name, {})[_label_key(labels)] = value
+    
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict] = None):
+        series = self.values.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.inc('stage_seconds', time.monotonic() - start, {'stage': name})
+    
+    @asynccontextmanager
+    async def loop_lag(self, interval: float = LAG_INTERVAL):
+        """Sample how late the event loop wakes a sleeper, for the block's duration."""
+        
+        async def sample():
+            while True:
+                start = time.monotonic()
+                await asyncio.sleep(interval)
+                lag = max(0.0, time.monotonic() - start - interval)
+                self.lag.add(lag * 1000)
+                self.lag_max = max(self.lag_max, lag)
+                self.lag_sum += lag
+        
+        task = asyncio.ensure_future(sample())
+        try:
+            yield
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    def _lag_summary(self) -> Dict:
+        if not self.lag.total:
+            return {}
+        summary = {f'p{q}_ms': self.lag.percentile(q) for q in LAG_QUANTILES}
+        summary['max_ms'] = round(self.lag_max * 1000, 2)
+        summary['sum_ms'] = round(self.lag_sum * 1000, 2)
+        summary['samples'] = self.lag.total
+        return summary
+    
+    def report(self) -> Dict:
+        metrics = {}
+        for name, series in sorted(self.values.items()):
+            rows = []
+            for key, value in sorted(series.items()):
+                rows.append({'labels': dict(key), 'value': round(value, 4)})
+            metrics[name] = rows
+        return {
+            'job': self.job,
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'duration_seconds': round(time.monotonic() - self.started, 3),
+            'metrics': metrics,
+            'loop_lag': self._lag_summary(),
+        }
+    
+    def to_prometheus(self, report: Optional[Dict] = None) -> str:
+        report = report or self.report()
+        job = _escape(self.job)
+        lines: List[str] = []
+        
+        def header(name):
+            kind, text = HELP.get(name, ('gauge', name))
+            lines.append(f'# HELP {PREFIX}{name} {text}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+        
+        for name, rows in report['metrics'].items():
+            header(name)
+            for row in rows:
+                labels = {'job': job, **{k: _escape(v) for k, v in row['labels'].items()}}
+                rendered = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{PREFIX}{name}{{{rendered}}} {row["value"]}')
+        
+        lag = report['loop_lag']
+        if lag:
+            header('loop_lag_seconds')
+            for q in LAG_QUANTILES:
+                lines.append(f'{PREFIX}loop_lag_seconds{{job="{job}",quantile="{q / 100}"}} {lag[f"p{q}_ms"] / 1000}')
+            lines.append(f'{PREFIX}loop_lag_seconds_sum{{job="{job}"}} {lag["sum_ms"] / 1000}')
+            lines.append(f'{PREFIX}loop_lag_seconds_count{{job="{job}"}} {lag["samples"]}')
+        
+        header('run_duration_seconds')
+        lines.append(f'{PREFIX}run_duration_seconds{{job="{job}"}} {report["duration_seconds"]}')
+        header('run_timestamp_seconds')
+        lines.append(f'{PREFIX}run_timestamp_seconds{{job="{job}"}} {int(time.time())}')
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, directory: Optional[Path] = None) -> Path:
+        """Write <job>.json and <job>.prom; returns the JSON path."""
+        directory = Path(directory) if directory else get_metrics_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        json_path = directory / f'{self.job}.json'
+        save_json(report, str(json_path))
+        # Atomic so the textfile collector never reads a partial file
+        serialization.write_atomic(directory / f'{self.job}.prom', self.to_prometheus(report))
+        return json_path
\ No newline at end of file
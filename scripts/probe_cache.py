@@ -0,0 +1,174 @@
+"""
+Cross-run probe result cache for the stream checker.
+
+data/cache/probes.json keeps, per channel id, the last probe result, the
+HEAD response's ETag/Last-Modified and a stability counter: the number of
+consecutive probes that came back with the same status, HTTP code and
+Content-Type (dead results never count as stable).
+
+Once a channel has been stable for STABLE_AFTER probes its result is reused
+without a request for a TTL that doubles with every further stable probe, from
+BASE_TTL up to MAX_TTL. When the TTL runs out the channel is revalidated with
+a single conditional HEAD (If-None-Match / If-Modified-Since); a 304, or the
+same code and Content-Type, confirms the cached result. Anything else falls
+back to a full probe and resets the counter.
+
+Time saved is estimated from the cached entry's last full probe duration.
+"""
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+
+from utils import get_project_root, load_json, save_json
+import probe_trace
+
+
+STABLE_AFTER = 3
+BASE_TTL = 30 * 60
+MAX_TTL = 6 * 3600
+# A run starting a little early still counts as "after" the TTL
+TTL_SLACK = 5 * 60
+MAX_AGE = 7 * 86400
+REVALIDATE_TIMEOUT = 6
+RESULT_FIELDS = ('status', 'http_code', 'content_type', 'resp_time_ms', 'browser_playable', 'checked_at')
+
+
+def get_probe_cache_file() -> Path:
+    return get_project_root() / "data" / "cache" / "probes.json"
+
+
+def ttl_for(stable: int) -> int:
+    if stable < STABLE_AFTER:
+        return 0
+    return min(BASE_TTL * 2 ** (stable - STABLE_AFTER), MAX_TTL)
+
+
+def read_validators(resp: aiohttp.ClientResponse, validators: Dict):
+    if resp.headers.get('ETag'):
+        validators['etag'] = resp.headers['ETag']
+    if resp.headers.get('Last-Modified'):
+        validators['last_modified'] = resp.headers['Last-Modified']
+
+
+def same_answer(entry: Dict, result: Dict) -> bool:
+    return (
+        result.get('status') != 'dead' and
+        result.get('status') == entry['result'].get('status') and
+        result.get('http_code') == entry['result'].get('http_code') and
+        result.get('content_type') == entry['result'].get('content_type')
+    )
+
+
+class ProbeCache:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_probe_cache_file()
+        self.entries: Dict[str, Dict] = load_json(str(self.path)) or {}
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'saved_ms': 0.0}
+    
+    def _entry(self, channel: Dict) -> Optional[Dict]:
+        entry = self.entries.get(channel.get('id'))
+        # A changed stream URL is a different stream
+        if entry and entry.get('stream_url') == channel.get('stream_url'):
+            return entry
+        return None
+    
+    def forget(self, channel: Dict):
+        """Drop a channel's entry (e.g. one too broken to use); it is probed in full next time."""
+        self.entries.pop(channel.get('id'), None)
+    
+    def lookup(self, channel: Dict) -> Optional[Dict]:
+        """The cached result if the channel is within its TTL, else None."""
+        entry = self._entry(channel)
+        if entry is None or not entry.get('ttl'):
+            return None
+        try:
+            if time.time() - entry['probed_at'] >= entry['ttl'] - TTL_SLACK:
+                return None
+            cached = dict(entry['result'])
+        except (KeyError, TypeError):
+            self.forget(channel)
+            return None
+        self.stats['hits'] += 1
+        self.stats['saved_ms'] += entry.get('probe_ms') or 0
+        result = {'id': channel['id'], 'name': channel.get('name'), 'stream_url': channel['stream_url']}
+        result.update(cached)
+        result['cached'] = 'hit'
+        return result
+    
+    def revalidatable(self, channel: Dict) -> Optional[Dict]:
+        """The entry of a stable channel whose TTL ran out."""
+        entry = self._entry(channel)
+        if entry is None or entry.get('stable', 0) < STABLE_AFTER:
+            return None
+        return entry
+    
+    async def revalidate(self, session: aiohttp.ClientSession, channel: Dict, entry: Dict, timings: Dict, validators: Dict) -> Optional[Dict]:
+        """Conditional HEAD; the refreshed cached result if it confirms the entry, else None."""
+        headers = dict(channel.get('http_headers') or {})
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        start = time.monotonic()
+        try:
+            async with session.head(channel['stream_url'], headers=headers, timeout=aiohttp.ClientTimeout(total=REVALIDATE_TIMEOUT),
+                                    allow_redirects=True, trace_request_ctx=timings) as resp:
+                code = resp.status
+                content_type = resp.headers.get('Content-Type') or None
+                read_validators(resp, validators)
+        except Exception:
+            return None
+        elapsed_ms = (time.monotonic() - start) * 1000
+        cached = entry['result']
+        if code != 304 and (code != cached.get('http_code') or content_type != cached.get('content_type')):
+            return None
+        
+        self.stats['revalidated'] += 1
+        self.stats['saved_ms'] += max(0.0, (entry.get('probe_ms') or 0) - elapsed_ms)
+        result = {'id': channel['id'], 'name': channel.get('name'), 'stream_url': channel['stream_url']}
+        result.update(cached)
+        result['resp_time_ms'] = round(elapsed_ms, 2)
+        result['checked_at'] = datetime.now(timezone.utc).isoformat()
+        result['timings'] = probe_trace.round_timings(timings)
+        result['cached'] = 'revalidated'
+        return result
+    
+    def record(self, channel: Dict, result: Dict, probe_ms: float, validators: Optional[Dict] = None):
+        """Fold a probe (full or revalidation) into the cache."""
+        validators = validators or {}
+        if result.get('cached') != 'revalidated':
+            self.stats['misses'] += 1
+        entry = self._entry(channel)
+        stable = entry['stable'] + 1 if entry and same_answer(entry, result) else 0
+        new_entry = {
+            'stream_url': channel['stream_url'],
+            'result': {field: result.get(field) for field in RESULT_FIELDS},
+            'stable': stable,
+            'ttl': ttl_for(stable),
+            'probed_at': time.time(),
+            # A revalidation is cheaper than the probe it stands in for; keep the full probe's cost
+            'probe_ms': round(entry['probe_ms'] if entry and result.get('cached') == 'revalidated' else probe_ms, 1),
+        }
+        if result.get('cached') == 'revalidated' and entry:
+            # A 304 need not repeat the validators
+            validators = validators or {k: entry[k] for k in ('etag', 'last_modified') if entry.get(k)}
+        new_entry.update(validators)
+        self.entries[channel['id']] = new_entry
+    
+    def report(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['revalidated'] + self.stats['misses']
+        return {
+            'hits': self.stats['hits'],
+            'revalidated': self.stats['revalidated'],
+            'misses': self.stats['misses'],
+            'hit_rate': round((self.stats['hits'] + self.stats['revalidated']) / lookups, 4) if lookups else 0.0,
+            'saved_seconds': round(self.stats['saved_ms'] / 1000, 1),
+            'entries': len(self.entries),
+        }
+    
+    def save(self):
+        cutoff = time.time() - MAX_AGE
+        save_json({k: e for k, e in sorted(self.entries.items()) if e['probed_at'] > cutoff}, str(self.path))
@@ -0,0 +1,127 @@
+"""
+Per-phase timing for stream probes.
+
+A request made with trace_request_ctx=<timings dict> gets its DNS, connect
+and time-to-first-byte phases added to that dict by aiohttp's TraceConfig
+hooks. Phases are summed over every request of one probe (HEAD, fallback
+GET, redirect hops), so together with queue_ms and body_ms they explain
+where a probe's resp_time_ms went:
+
+    queue_ms    waiting for a free worker or a pooled connection
+    dns_ms      resolving the host
+    connect_ms  TCP connect plus TLS handshake (aiohttp has no separate TLS hook)
+    ttfb_ms     request sent -> response headers
+    body_ms     reading the response body
+
+Requests made without a trace_request_ctx (e.g. deep probes) are ignored.
+"""
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+from utils import Histogram
+
+
+PHASES = ('queue_ms', 'dns_ms', 'connect_ms', 'ttfb_ms', 'body_ms')
+
+
+def new_timings() -> Dict[str, float]:
+    return {phase: 0.0 for phase in PHASES}
+
+
+def add_phase(timings: Dict[str, float], phase: str, seconds: float):
+    timings[phase] = timings.get(phase, 0.0) + seconds * 1000
+
+
+def round_timings(timings: Dict[str, float]) -> Dict[str, float]:
+    return {phase: round(value, 2) for phase, value in timings.items()}
+
+
+def _timings(ctx):
+    timings = ctx.trace_request_ctx
+    return timings if isinstance(timings, dict) else None
+
+
+async def _on_queued_start(session, ctx, params):
+    ctx.queued_at = time.monotonic()
+
+
+async def _on_queued_end(session, ctx, params):
+    timings = _timings(ctx)
+    if timings is not None:
+        add_phase(timings, 'queue_ms', time.monotonic() - ctx.queued_at)
+
+
+async def _on_create_start(session, ctx, params):
+    ctx.create_at = time.monotonic()
+    ctx.dns_in_create = 0.0
+
+
+async def _on_create_end(session, ctx, params):
+    timings = _timings(ctx)
+    if timings is not None:
+        # DNS resolution happens inside connection creation; don't count it twice
+        add_phase(timings, 'connect_ms', time.monotonic() - ctx.create_at - getattr(ctx, 'dns_in_create', 0.0))
+
+
+async def _on_dns_start(session, ctx, params):
+    ctx.dns_at = time.monotonic()
+
+
+async def _on_dns_end(session, ctx, params):
+    elapsed = time.monotonic() - ctx.dns_at
+    ctx.dns_in_create = getattr(ctx, 'dns_in_create', 0.0) + elapsed
+    timings = _timings(ctx)
+    if timings is not None:
+        add_phase(timings, 'dns_ms', elapsed)
+
+
+async def _on_headers_sent(session, ctx, params):
+    ctx.sent_at = time.monotonic()
+
+
+async def _on_response_headers(session, ctx, params):
+    # Fires once per redirect hop and once for the final response
+    timings = _timings(ctx)
+    sent_at = getattr(ctx, 'sent_at', None)
+    if timings is not None and sent_at is not None:
+        add_phase(timings, 'ttfb_ms', time.monotonic() - sent_at)
+        ctx.sent_at = None
+
+
+def make_trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_queued_start.append(_on_queued_start)
+    trace.on_connection_queued_end.append(_on_queued_end)
+    trace.on_connection_create_start.append(_on_create_start)
+    trace.on_connection_create_end.append(_on_create_end)
+    trace.on_dns_resolvehost_start.append(_on_dns_start)
+    trace.on_dns_resolvehost_end.append(_on_dns_end)
+    trace.on_request_headers_sent.append(_on_headers_sent)
+    trace.on_request_redirect.append(_on_response_headers)
+    trace.on_request_end.append(_on_response_headers)
+    return trace
+
+
+class PhaseStats:
+    """Streaming p50/p95/p99 of every phase over the probes of one run."""
+    
+    def __init__(self):
+        self.histograms = {phase: Histogram() for phase in PHASES}
+    
+    def add(self, timings: Optional[Dict[str, float]]):
+        for phase, value in (timings or {}).items():
+            if phase in self.histograms:
+                self.histograms[phase].add(value)
+    
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            phase: {
+                'p50': hist.percentile(50),
+                'p95': hist.percentile(95),
+                'p99': hist.percentile(99),
+            }
+            for phase, hist in self.histograms.items()
+            if hist.total
+        }
\ No newline at end of file
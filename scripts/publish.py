@@ -0,0 +1,223 @@
+"""
+Publish site data bundles.
+
+Joins data/channels.json with data/status/latest.json, keeps only the
+fields the site renders and writes minified, content-hashed shards to
+data/site/:
+
+    manifest.json                         shard list; the only file the site fetches by name
+    channels.<shard>.<hash>.json          minified shard
+    channels.<shard>.<hash>.json.gz       pre-gzipped copy
+    channels.<shard>.<hash>.json.br       pre-brotli'd copy (when the brotli module is installed)
+
+Shards are keyed by category and language. Languages with fewer than
+MIN_SHARD_SIZE channels in a category are folded into that category's
+mixed shard (language "*"), whose manifest entry lists the languages it
+holds. Shards whose content didn't change keep their file name, so clients
+and CDNs can cache them forever. Members of a duplicate cluster
+(clusters.py) carry their representative's id as "cluster".
+
+    python scripts/publish.py
+"""
+import gzip
+import hashlib
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from utils import get_project_root, load_json
+import clusters
+import search_index
+import serialization
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MIN_SHARD_SIZE = 40
+HASH_LENGTH = 12
+CHANNEL_FIELDS = ('id', 'name', 'language', 'country', 'category', 'group', 'logo', 'stream_url', 'browser_playable', 'health_score')
+
+
+def get_site_data_dir() -> Path:
+    return get_project_root() / "data" / "site"
+
+
+def slugify(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-') or 'other'
+
+
+def site_record(channel: Dict, status: Optional[Dict]) -> Dict:
+    """The fields the site renders; empty values are dropped."""
+    record = {field: channel.get(field) for field in CHANNEL_FIELDS}
+    status = status or {}
+    record['status'] = status.get('status') or 'unknown'
+    record['http_code'] = status.get('http_code')
+    if status.get('resp_time_ms') is not None:
+        record['resp_time_ms'] = round(status['resp_time_ms'])
+    return {k: v for k, v in record.items() if v not in (None, '', [])}
+
+
+def join_catalog(channels: List[Dict], statuses: List[Dict], cluster_of: Optional[Dict[str, str]] = None) -> List[Dict]:
+    by_id = {s['id']: s for s in statuses if s.get('id')}
+    cluster_of = cluster_of or {}
+    records = []
+    for ch in channels:
+        record = site_record(ch, by_id.get(ch['id']))
+        # Duplicates point at their cluster's representative so the site can fold them
+        if cluster_of.get(ch['id'], ch['id']) != ch['id']:
+            record['cluster'] = cluster_of[ch['id']]
+        records.append(record)
+    return records
+
+
+def shard_records(records: List[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+    """Group records by (category, language), folding small languages into (category, '*')."""
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    for record in records:
+        key = (record.get('category') or 'Other', record.get('language') or 'Unknown')
+        groups.setdefault(key, []).append(record)
+    
+    shards: Dict[Tuple[str, str], List[Dict]] = {}
+    for (category, language), items in sorted(groups.items()):
+        if len(items) < MIN_SHARD_SIZE:
+            shards.setdefault((category, '*'), []).extend(items)
+        else:
+            shards[(category, language)] = items
+    for items in shards.values():
+        items.sort(key=lambda r: r['name'].lower())
+    return shards
+
+
+def write_if_missing(path: Path, data: bytes):
+    # Content-hashed names: an existing file already holds exactly these bytes
+    if not path.exists():
+        serialization.write_atomic(path, data)
+
+
+def write_bundle(out_dir: Path, name: str, body: bytes) -> Dict:
+    """Write a file with its .gz (and .br) copies; returns their sizes."""
+    write_if_missing(out_dir / name, body)
+    gz_path = out_dir / f"{name}.gz"
+    if not gz_path.exists():
+        # mtime=0 keeps the .gz byte-identical across runs
+        write_if_missing(gz_path, gzip.compress(body, compresslevel=9, mtime=0))
+    sizes = {'bytes': len(body), 'gzip_bytes': gz_path.stat().st_size}
+    if brotli is not None:
+        br_path = out_dir / f"{name}.br"
+        if not br_path.exists():
+            write_if_missing(br_path, brotli.compress(body, quality=11))
+        sizes['brotli_bytes'] = br_path.stat().st_size
+    return sizes
+
+
+def publish_search_index(channels: List[Dict], out_dir: Path, previous: Optional[Dict]) -> Dict:
+    """The search index entry; rebuilt only when the indexed catalog fields changed."""
+    digest = search_index.catalog_hash(channels)
+    if previous and previous.get('catalog_hash') == digest and (out_dir / previous['file']).exists():
+        return dict(previous, rebuilt=False)
+    index = search_index.build_index(channels)
+    name = f"search.{digest}.json"
+    return {
+        'file': name,
+        'catalog_hash': digest,
+        'documents': len(index['ids']),
+        'keys': len(index['postings']),
+        **write_bundle(out_dir, name, serialization.dumps(index)),
+        'rebuilt': True,
+    }
+
+
+def publish(channels: List[Dict], statuses: List[Dict], out_dir: Optional[Path] = None, cluster_of: Optional[Dict[str, str]] = None) -> Dict:
+    out_dir = Path(out_dir) if out_dir else get_site_data_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    records = join_catalog(channels, statuses, cluster_of)
+    
+    entries = []
+    for (category, language), items in shard_records(records).items():
+        body = serialization.dumps(items)
+        digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+        slug = slugify(category) if language == '*' else f"{slugify(category)}.{slugify(language)}"
+        name = f"channels.{slug}.{digest}.json"
+        
+        entry = {
+            'file': name,
+            'category': category,
+            'language': language,
+            'count': len(items),
+            **write_bundle(out_dir, name, body),
+        }
+        if language == '*':
+            languages = {}
+            for record in items:
+                lang = record.get('language') or 'Unknown'
+                languages[lang] = languages.get(lang, 0) + 1
+            entry['languages'] = dict(sorted(languages.items()))
+        entries.append(entry)
+    
+    # Largest shards first: that's what the site should request first
+    entries.sort(key=lambda e: (-e['count'], e['file']))
+    manifest = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'channels': len(records),
+        'categories': sorted({e['category'] for e in entries}),
+        'languages': sorted({r.get('language') or 'Unknown' for r in records}),
+        'shards': entries,
+    }
+    
+    manifest_path = out_dir / 'manifest.json'
+    previous = load_json(str(manifest_path)) or {}
+    search = publish_search_index(channels, out_dir, previous.get('search'))
+    rebuilt = search.pop('rebuilt')
+    manifest['search'] = search
+    serialization.dump(manifest, manifest_path)
+    
+    # Keep the previous generation too, for clients still holding the old manifest
+    keep = {e['file'] for e in entries} | {e['file'] for e in previous.get('shards', [])}
+    keep.add(search['file'])
+    if previous.get('search'):
+        keep.add(previous['search']['file'])
+    removed = 0
+    for path in [*out_dir.glob('channels.*.json*'), *out_dir.glob('search.*.json*')]:
+        base = path.name[:-3] if path.name.endswith(('.gz', '.br')) else path.name
+        if base not in keep:
+            path.unlink()
+            removed += 1
+    manifest['removed_files'] = removed
+    manifest['search_rebuilt'] = rebuilt
+    return manifest
+
+
+def main():
+    root = get_project_root()
+    channels = load_json(str(root / 'data' / 'channels.json'))
+    if not channels:
+        print("Error: No channels found")
+        sys.exit(1)
+    statuses = load_json(str(root / 'data' / 'status' / 'latest.json')) or []
+    
+    manifest = publish(channels, statuses, cluster_of=clusters.load_cluster_map())
+    shards = manifest['shards']
+    raw = sum(e['bytes'] for e in shards)
+    gz = sum(e['gzip_bytes'] for e in shards)
+    print(f"Published {manifest['channels']} channels in {len(shards)} shards to {get_site_data_dir()}")
+    print(f"  Minified: {raw / 1024:.1f} KiB, gzip: {gz / 1024:.1f} KiB"
+          + (f", brotli: {sum(e['brotli_bytes'] for e in shards) / 1024:.1f} KiB" if brotli is not None else ""))
+    print(f"  Largest shard: {shards[0]['file']} ({shards[0]['gzip_bytes'] / 1024:.1f} KiB gzip)")
+    search = manifest['search']
+    print(f"  Search index: {search['keys']} keys, {search['gzip_bytes'] / 1024:.1f} KiB gzip"
+          + (" (rebuilt)" if manifest['search_rebuilt'] else " (catalog unchanged, kept)"))
+    if manifest['removed_files']:
+        print(f"  Removed {manifest['removed_files']} stale file(s)")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
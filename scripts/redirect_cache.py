@@ -0,0 +1,99 @@
+"""
+Redirect-chain cache for the stream checker.
+
+Many stream URLs answer with one to three redirects, often to another host,
+so every run re-walks the chain and pays for the extra connections and TLS
+handshakes. data/cache/redirects.json keeps, per channel id, the chain the
+last probe followed (original URL first, final URL last).
+
+Later runs probe the cached final URL directly and fall back to the original
+URL only when that fails, which also drops the entry. Chains are re-walked
+from the original URL after REWALK_AFTER, so a moved redirect target is
+noticed even while the old one still answers. Channels that stop
+redirecting lose their entry.
+
+The run report counts channels by chain length (hops).
+"""
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from utils import get_project_root, load_json, save_json
+
+
+REWALK_AFTER = 24 * 3600
+MAX_AGE = 7 * 86400
+MAX_HOPS_BUCKET = 3
+
+
+def get_redirect_cache_file() -> Path:
+    return get_project_root() / "data" / "cache" / "redirects.json"
+
+
+def response_chain(resp: aiohttp.ClientResponse) -> List[str]:
+    """Every URL the request went through, final URL last."""
+    return [str(r.url) for r in resp.history] + [str(resp.url)]
+
+
+def hops_bucket(hops: int) -> str:
+    return f"{MAX_HOPS_BUCKET}+" if hops >= MAX_HOPS_BUCKET else str(hops)
+
+
+class RedirectCache:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_redirect_cache_file()
+        self.entries: Dict[str, Dict] = load_json(str(self.path)) or {}
+        self.hops: Dict[str, int] = {}
+        self.stats = {'shortcut': 0, 'fallback': 0}
+    
+    def _entry(self, channel: Dict) -> Optional[Dict]:
+        entry = self.entries.get(channel.get('id'))
+        if entry and entry['chain'][0] == channel.get('stream_url'):
+            return entry
+        return None
+    
+    def target(self, channel: Dict) -> Optional[str]:
+        """The cached final URL to probe instead of the channel's own, if any."""
+        entry = self._entry(channel)
+        if entry is None or time.time() - entry['resolved_at'] >= REWALK_AFTER:
+            return None
+        return entry['chain'][-1]
+    
+    def record(self, channel: Dict, chain: List[str], shortcut: bool = False):
+        """Fold in the chain a probe followed; with shortcut=True it started at the cached final URL."""
+        if shortcut:
+            # A successful probe of the final URL confirms the cached chain, and may extend it
+            entry = self._entry(channel)
+            if entry is None:
+                return
+            self.stats['shortcut'] += 1
+            if len(chain) > 1:
+                entry['chain'] = entry['chain'][:-1] + chain
+            full = entry['chain']
+        else:
+            full = chain
+            if len(chain) > 1:
+                self.entries[channel['id']] = {'chain': chain, 'resolved_at': time.time()}
+            else:
+                self.entries.pop(channel['id'], None)
+        bucket = hops_bucket(len(full) - 1)
+        self.hops[bucket] = self.hops.get(bucket, 0) + 1
+    
+    def fallback(self, channel: Dict):
+        """The cached final URL failed; the probe goes back to the original URL."""
+        self.stats['fallback'] += 1
+        self.entries.pop(channel['id'], None)
+    
+    def report(self) -> Dict:
+        return {
+            'hops': dict(sorted(self.hops.items())),
+            'shortcut': self.stats['shortcut'],
+            'fallback': self.stats['fallback'],
+            'entries': len(self.entries),
+        }
+    
+    def save(self):
+        cutoff = time.time() - MAX_AGE
+        save_json({k: e for k, e in sorted(self.entries.items()) if e['resolved_at'] > cutoff}, str(self.path))
@@ -0,0 +1,285 @@
+"""
+Tiered retention and rollups for status data.
+
+Raw per-run results (legacy data/status/<date>.json files and the run log in
+data/status/log/) are condensed into per-channel aggregates under
+data/status/rollup/:
+
+    daily/<YYYY-MM-DD>.json     one aggregate per channel and day
+    weekly/<YYYY>-W<ww>.json    daily aggregates merged per ISO week
+    summary.json                per category and per language, per day and week
+
+An aggregate holds the runs seen, up (live, slow or unstable) and down
+(dead) counts, min/median/max resp_time_ms and the dominant status. Each
+run of the run log counts every channel's state as of that run, carried
+results included.
+
+Retention: raw files older than RAW_DAYS are deleted once their day is
+rolled up, except legacy files not yet imported into the history store
+(status_store.py import), which hold the only per-run copy of their data;
+runs in the columnar history store (data/history) older than HISTORY_DAYS
+are dropped, which keeps the 30-day analytics window whole; daily rollups
+older than DAILY_DAYS are merged into their week (once the whole week is
+that old) and deleted. Weekly medians are the run-weighted median of the
+daily medians.
+
+    python scripts/rollup.py [--raw-days 14] [--history-days 30] [--daily-days 90]
+"""
+import argparse
+import re
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from statistics import median
+from typing import Dict, Iterable, List, Optional
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from utils import get_project_root, load_json
+from status_store import StatusHistory
+import run_log
+import serialization
+
+
+RAW_DAYS = 14
+HISTORY_DAYS = 30
+DAILY_DAYS = 90
+UP_STATUSES = ('live', 'slow', 'unstable')
+DOWN_STATUSES = ('dead',)
+DATE_FILE = re.compile(r'^\d{4}-\d{2}-\d{2}\.json$')
+
+
+def get_rollup_dir() -> Path:
+    return get_project_root() / "data" / "status" / "rollup"
+
+
+def week_key(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def raw_days(status_dir: Path) -> Dict[str, List[Path]]:
+    """Raw files by day: legacy full-catalog files and run log files."""
+    days: Dict[str, List[Path]] = {}
+    for path in status_dir.glob('*.json'):
+        if DATE_FILE.match(path.name):
+            days.setdefault(path.stem, []).append(path)
+    for path in run_log.log_files(status_dir / 'log'):
+        days.setdefault(path.stem, []).append(path)
+    return dict(sorted(days.items()))
+
+
+def iter_runs(paths: Iterable[Path]) -> Iterable[List[Dict]]:
+    """The records of every run in a day's raw files."""
+    for path in paths:
+        if path.suffix == '.ndjson':
+            # Each day's log opens with a snapshot, so it replays on its own
+            view = {}
+            for entry in run_log.iter_entries(path):
+                if entry['kind'] == 'snapshot':
+                    view = {}
+                for record in entry['records']:
+                    view[record['id']] = record
+                for channel_id in entry.get('removed', []):
+                    view.pop(channel_id, None)
+                yield list(view.values())
+        else:
+            records = load_json(str(path))
+            if isinstance(records, list):
+                yield records
+
+
+def dominant(counts: Dict[str, int]) -> Optional[str]:
+    if not counts:
+        return None
+    return max(sorted(counts), key=lambda status: counts[status])
+
+
+def aggregate_day(paths: List[Path]) -> Dict:
+    samples: Dict[str, Dict] = {}
+    runs = 0
+    for records in iter_runs(paths):
+        runs += 1
+        for record in records:
+            if not record.get('id'):
+                continue
+            sample = samples.setdefault(record['id'], {'statuses': {}, 'times': []})
+            status = record.get('status') or 'unknown'
+            sample['statuses'][status] = sample['statuses'].get(status, 0) + 1
+            if record.get('resp_time_ms') is not None:
+                sample['times'].append(record['resp_time_ms'])
+    
+    channels = {}
+    for channel_id, sample in samples.items():
+        statuses, times = sample['statuses'], sample['times']
+        channels[channel_id] = {
+            'runs': sum(statuses.values()),
+            'up': sum(statuses.get(s, 0) for s in UP_STATUSES),
+            'down': sum(statuses.get(s, 0) for s in DOWN_STATUSES),
+            'status': dominant(statuses),
+            'min_ms': round(min(times), 1) if times else None,
+            'median_ms': round(median(times), 1) if times else None,
+            'max_ms': round(max(times), 1) if times else None,
+        }
+    return {'runs': runs, 'channels': channels}
+
+
+def weighted_median(pairs: List[tuple]) -> Optional[float]:
+    """Median of (value, weight) pairs."""
+    pairs = sorted(p for p in pairs if p[0] is not None)
+    if not pairs:
+        return None
+    half = sum(w for _, w in pairs) / 2
+    seen = 0
+    for value, weight in pairs:
+        seen += weight
+        if seen >= half:
+            return value
+    return pairs[-1][0]
+
+
+def merge_aggregates(aggregates: List[Dict]) -> Dict:
+    """Merge day aggregates into one (used for weeks)."""
+    merged: Dict[str, Dict] = {}
+    for aggregate in aggregates:
+        for channel_id, day in aggregate['channels'].items():
+            entry = merged.setdefault(channel_id, {'runs': 0, 'up': 0, 'down': 0, 'statuses': {}, 'mins': [], 'medians': [], 'maxes': []})
+            entry['runs'] += day['runs']
+            entry['up'] += day['up']
+            entry['down'] += day['down']
+            if day['status']:
+                entry['statuses'][day['status']] = entry['statuses'].get(day['status'], 0) + day['runs']
+            if day['median_ms'] is not None:
+                entry['mins'].append(day['min_ms'])
+                entry['medians'].append((day['median_ms'], day['runs']))
+                entry['maxes'].append(day['max_ms'])
+    
+    channels = {}
+    for channel_id, entry in merged.items():
+        channels[channel_id] = {
+            'runs': entry['runs'],
+            'up': entry['up'],
+            'down': entry['down'],
+            'status': dominant(entry['statuses']),
+            'min_ms': min(entry['mins']) if entry['mins'] else None,
+            'median_ms': weighted_median(entry['medians']),
+            'max_ms': max(entry['maxes']) if entry['maxes'] else None,
+        }
+    return {'runs': sum(a['runs'] for a in aggregates), 'channels': channels}
+
+
+def summarize(aggregate: Dict, catalog: Dict[str, Dict]) -> Dict:
+    """Per category and per language totals of one aggregate."""
+    groups = {'categories': {}, 'languages': {}}
+    for channel_id, entry in aggregate['channels'].items():
+        channel = catalog.get(channel_id, {})
+        for kind, key in (('categories', channel.get('category') or 'Other'), ('languages', channel.get('language') or 'Unknown')):
+            group = groups[kind].setdefault(key, {'channels': 0, 'runs': 0, 'up': 0, 'down': 0, 'statuses': {}, 'medians': []})
+            group['channels'] += 1
+            group['runs'] += entry['runs']
+            group['up'] += entry['up']
+            group['down'] += entry['down']
+            if entry['status']:
+                group['statuses'][entry['status']] = group['statuses'].get(entry['status'], 0) + 1
+            if entry['median_ms'] is not None:
+                group['medians'].append(entry['median_ms'])
+    
+    for kind in groups.values():
+        for group in kind.values():
+            medians = group.pop('medians')
+            group['uptime'] = round(group['up'] / group['runs'], 4) if group['runs'] else None
+            group['median_ms'] = round(median(medians), 1) if medians else None
+    return groups
+
+
+def rollup(status_dir: Optional[Path] = None, rollup_dir: Optional[Path] = None, catalog: Optional[List[Dict]] = None,
+           raw_keep_days: int = RAW_DAYS, daily_keep_days: int = DAILY_DAYS, today: Optional[date] = None,
+           history: Optional[StatusHistory] = None, history_keep_days: int = HISTORY_DAYS) -> Dict:
+    status_dir = status_dir or get_project_root() / "data" / "status"
+    history = history or StatusHistory()
+    imported = {run.get('source') for run in history.runs}
+    rollup_dir = rollup_dir or get_rollup_dir()
+    today = today or datetime.now(timezone.utc).date()
+    by_id = {ch['id']: ch for ch in catalog or []}
+    summary_file = rollup_dir / 'summary.json'
+    summary = load_json(str(summary_file)) or {'daily': {}, 'weekly': {}}
+    report = {'rolled_days': 0, 'removed_raw': 0, 'kept_unimported': 0, 'dropped_runs': 0, 'rolled_weeks': 0, 'removed_daily': 0}
+    
+    # Raw -> daily: every finished day gets a rollup once; raw files go after raw_keep_days
+    raw_cutoff = today - timedelta(days=raw_keep_days)
+    for day, paths in raw_days(status_dir).items():
+        when = date.fromisoformat(day)
+        if when >= today:
+            continue
+        daily_file = rollup_dir / 'daily' / f"{day}.json"
+        # A day whose week is already merged is in the weekly file, even if its raw files are still around
+        if not daily_file.exists() and week_key(when) not in summary['weekly']:
+            aggregate = aggregate_day(paths)
+            serialization.dump(dict(aggregate, date=day), daily_file)
+            summary['daily'][day] = summarize(aggregate, by_id)
+            report['rolled_days'] += 1
+        if when < raw_cutoff:
+            for path in paths:
+                if path.suffix == '.json' and path.name not in imported:
+                    report['kept_unimported'] += 1
+                    continue
+                path.unlink()
+                report['removed_raw'] += 1
+    
+    # History store: never shorter than the raw window, so a legacy file still on disk keeps its imported run
+    history_cutoff = today - timedelta(days=max(history_keep_days, raw_keep_days))
+    report['dropped_runs'] = history.drop_runs_before(f"{history_cutoff.isoformat()}T00:00:00+00:00")
+    
+    # Daily -> weekly, one whole week at a time
+    daily_cutoff = today - timedelta(days=daily_keep_days)
+    weeks: Dict[str, List[Path]] = {}
+    for path in sorted((rollup_dir / 'daily').glob('*.json')):
+        when = date.fromisoformat(path.stem)
+        week_end = when + timedelta(days=6 - when.weekday())
+        if week_end < daily_cutoff:
+            weeks.setdefault(week_key(when), []).append(path)
+    for week, paths in weeks.items():
+        weekly_file = rollup_dir / 'weekly' / f"{week}.json"
+        aggregates = [load_json(str(path)) for path in paths]
+        existing = load_json(str(weekly_file))
+        if existing:
+            aggregates.append(existing)
+        aggregate = merge_aggregates(aggregates)
+        serialization.dump(dict(aggregate, week=week, days=sorted({*(p.stem for p in paths), *(existing or {}).get('days', [])})), weekly_file)
+        summary['weekly'][week] = summarize(aggregate, by_id)
+        report['rolled_weeks'] += 1
+        for path in paths:
+            summary['daily'].pop(path.stem, None)
+            path.unlink()
+            report['removed_daily'] += 1
+    
+    summary['daily'] = dict(sorted(summary['daily'].items()))
+    summary['weekly'] = dict(sorted(summary['weekly'].items()))
+    summary['generated_at'] = datetime.now(timezone.utc).isoformat()
+    serialization.dump(summary, summary_file)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll raw status data up into daily and weekly aggregates")
+    parser.add_argument('--raw-days', type=int, default=RAW_DAYS, help="keep raw per-run files this many days")
+    parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help="keep runs in the history store this many days")
+    parser.add_argument('--daily-days', type=int, default=DAILY_DAYS, help="keep daily rollups this many days")
+    args = parser.parse_args()
+    
+    root = get_project_root()
+    catalog = load_json(str(root / 'data' / 'channels.json')) or []
+    report = rollup(catalog=catalog, raw_keep_days=args.raw_days, daily_keep_days=args.daily_days, history_keep_days=args.history_days)
+    print(f"Rolled up {report['rolled_days']} day(s), removed {report['removed_raw']} raw file(s)")
+    if report['kept_unimported']:
+        print(f"Kept {report['kept_unimported']} legacy status file(s) not yet in the history store "
+              f"(run python scripts/status_store.py import)")
+    print(f"Dropped {report['dropped_runs']} run(s) older than {max(args.history_days, args.raw_days)} days from the history store")
+    print(f"Rolled up {report['rolled_weeks']} week(s), removed {report['removed_daily']} daily rollup(s)")
+    print(f"Rollups in {get_rollup_dir()}")
+
+
+if __name__ == '__main__':
+    main()
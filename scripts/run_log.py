@@ -0,0 +1,209 @@
+"""
+Append-only status run log.
+
+Every checker run appends one NDJSON line to data/status/log/<date>.ndjson:
+
+    {"seq": 812, "run_at": "...", "kind": "delta", "records": [...], "removed": [...]}
+
+A delta carries only the records whose status changed since the previous
+run; resp_time_ms alone counts as a change only when it moves by more than
+RESP_TIME_TOLERANCE and at least RESP_TIME_FLOOR_MS, so ordinary jitter is
+not logged. The first run of each day, and every COMPACT_EVERY runs after that,
+writes a full snapshot instead so readers never fold more than a short
+chain of deltas. Entries may also carry a per-run "timings" summary of
+probe phase percentiles.
+
+materialize() replays the last snapshot and the deltas after it. A record
+in that view is the one last logged, so its checked_at and resp_time_ms are
+from the run that last changed it, not necessarily the latest probe.
+
+data/status/latest.json is that view after the run, with the run's own
+record overlaid for every channel the run covered: probed, fanned out from
+a duplicate, or carried (backed off, cut off by the deadline, answered from
+the probe cache). Carried records are the view's own, so a partial run still
+lists every channel; channels that left the catalog are dropped.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils import get_project_root, save_json
+import serialization
+
+
+# One snapshot per day at the 30-minute cron cadence
+COMPACT_EVERY = 48
+DELTA_FIELDS = ('status', 'http_code', 'content_type', 'browser_playable')
+# resp_time_ms only counts as a change when it moves by more than this fraction and this many ms
+RESP_TIME_TOLERANCE = 0.25
+RESP_TIME_FLOOR_MS = 250
+
+
+def get_log_dir() -> Path:
+    return get_project_root() / "data" / "status" / "log"
+
+
+def record_changed(old: Dict, new: Dict) -> bool:
+    for field in DELTA_FIELDS:
+        if old.get(field) != new.get(field):
+            return True
+    old_time = old.get('resp_time_ms')
+    new_time = new.get('resp_time_ms')
+    if (old_time is None) != (new_time is None):
+        return True
+    if old_time and new_time:
+        return abs(new_time - old_time) > max(RESP_TIME_TOLERANCE * old_time, RESP_TIME_FLOOR_MS)
+    return False
+
+
+def iter_entries(path: Path) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield serialization.loads(line)
+
+
+def log_files(log_dir: Optional[Path] = None) -> List[Path]:
+    log_dir = log_dir or get_log_dir()
+    if not log_dir.exists():
+        return []
+    return sorted(log_dir.glob('*.ndjson'))
+
+
+def materialize(log_dir: Optional[Path] = None) -> Tuple[Dict[str, Dict], Dict]:
+    """
+    Rebuild the current status view from the log.
+    Returns (records by id, state) where state has the last seq and the
+    number of deltas written since the last snapshot.
+    """
+    files = log_files(log_dir)
+    state = {'seq': 0, 'since_snapshot': 0, 'last_file': None}
+    chain = []
+    
+    # Walk back to the newest file holding a snapshot, then replay forward
+    for path in reversed(files):
+        entries = list(iter_entries(path))
+        chain[:0] = entries
+        if any(entry['kind'] == 'snapshot' for entry in entries):
+            break
+    
+    view = {}
+    for entry in chain:
+        if entry['kind'] == 'snapshot':
+            view = {}
+            state['since_snapshot'] = 0
+        else:
+            state['since_snapshot'] += 1
+        for record in entry['records']:
+            view[record['id']] = record
+        for channel_id in entry.get('removed', []):
+            view.pop(channel_id, None)
+        state['seq'] = entry['seq']
+    
+    if files:
+        state['last_file'] = files[-1].name
+    return view, state
+
+
+class RunFold:
+    """
+    A run's results folded into the previous view as they complete, so the
+    run never holds a second copy of the catalog: each result replaces the
+    channel's previous record in `view` (which is updated in place) and only
+    the ids that changed are remembered. commit() then appends the run.
+    """
+    
+    def __init__(self, previous: Tuple[Dict, Dict], log_dir: Optional[Path] = None):
+        self.view, self.state = previous
+        self.log_dir = log_dir or get_log_dir()
+        self.was_empty = not self.view
+        self.seen = set()
+        self.changed = set()
+    
+    def add(self, result: Dict):
+        channel_id = result.get('id')
+        if not channel_id:
+            return
+        old = self.view.get(channel_id)
+        if channel_id not in self.seen and (old is None or record_changed(old, result)):
+            self.changed.add(channel_id)
+        self.view[channel_id] = result
+        self.seen.add(channel_id)
+    
+    def current(self) -> List[Dict]:
+        """This run's records so far."""
+        return [self.view[channel_id] for channel_id in self.seen]
+    
+    def commit(self, run_at: Optional[str] = None, timings: Optional[Dict] = None) -> Tuple[Dict, Dict[str, Dict]]:
+        """
+        Append the run to today's log. Returns (entry header, view); the view
+        holds this run's record of every channel it saw (unlike the log's
+        own view, whose unchanged records keep the values logged last), and
+        the header omits the records to keep it cheap to print.
+        """
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        run_at = run_at or datetime.now(timezone.utc).isoformat()
+        log_file = self.log_dir / f"{run_at[:10]}.ndjson"
+        view, state = self.view, self.state
+        
+        snapshot = (
+            self.was_empty or
+            state['last_file'] != log_file.name or
+            state['since_snapshot'] + 1 >= COMPACT_EVERY
+        )
+        
+        removed = [channel_id for channel_id in view if channel_id not in self.seen]
+        for channel_id in removed:
+            del view[channel_id]
+        ids = self.seen if snapshot else self.changed
+        records = sorted((view[channel_id] for channel_id in ids), key=lambda r: (r.get('name') or '').lower())
+        return self._write(log_file, run_at, snapshot, records, [] if snapshot else removed, timings), view
+    
+    def _write(self, log_file: Path, run_at: str, snapshot: bool, records: List[Dict], removed: List[str], timings: Optional[Dict]) -> Dict:
+        entry = {
+            'seq': self.state['seq'] + 1,
+            'run_at': run_at,
+            'kind': 'snapshot' if snapshot else 'delta',
+            'records': records,
+        }
+        if removed:
+            entry['removed'] = removed
+        if timings:
+            entry['timings'] = timings
+        
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(serialization.dumps_line(entry))
+        
+        header = {k: v for k, v in entry.items() if k not in ('records', 'removed')}
+        header['changed'] = len(records)
+        header['removed'] = len(removed)
+        return header
+
+
+def append_run(results: Iterable[Dict], run_at: Optional[str] = None, log_dir: Optional[Path] = None, previous: Optional[Tuple[Dict, Dict]] = None, timings: Optional[Dict] = None) -> Tuple[Dict, Dict[str, Dict]]:
+    """
+    Append a run to today's log (RunFold over results that are already all
+    in hand). `previous` is a materialize() result the caller already
+    holds; it is left untouched. Returns (entry header, updated view), the
+    view being what materialize() would now return.
+    """
+    log_dir = log_dir or get_log_dir()
+    view, state = previous or materialize(log_dir)
+    fold = RunFold((dict(view), state), log_dir)
+    for result in results:
+        fold.add(result)
+    header, current = fold.commit(run_at, timings)
+    if header['kind'] == 'snapshot':
+        return header, current
+    logged = {channel_id: view[channel_id] for channel_id in current if channel_id in view}
+    logged.update((channel_id, current[channel_id]) for channel_id in fold.changed)
+    return header, logged
+
+
+def write_latest(view: Dict[str, Dict], path: Optional[Path] = None) -> Path:
+    """Write latest.json from a view with the run's records overlaid (RunFold.commit() returns one)."""
+    path = path or get_project_root() / "data" / "status" / "latest.json"
+    records = sorted(view.values(), key=lambda r: (r.get('name') or '').lower())
+    save_json(records, str(path))
+    return path
@@ -0,0 +1,71 @@
+"""
+Health-driven probe scheduling.
+
+Healthy and flapping channels are probed on every run. A channel that has
+been dead for BACKOFF_AFTER consecutive probes and whose health_score has
+dropped below DEAD_HEALTH backs off exponentially with its failure streak,
+or by DOWNTIME_SHARE of the time since it last answered (last_seen, set on
+live and slow probes) if that is longer, up to MAX_INTERVAL. So a channel
+that has been gone for weeks waits close to MAX_INTERVAL, while one that
+died an hour ago follows its streak. A small random share of the backed-off
+channels is rechecked each run anyway so resurrections are noticed before
+their next scheduled probe.
+"""
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+RUN_INTERVAL = timedelta(minutes=30)
+MAX_INTERVAL = timedelta(days=1)
+BACKOFF_AFTER = 3
+DEAD_HEALTH = 0.3
+RECHECK_FRACTION = 0.02
+DOWNTIME_SHARE = 0.25
+
+
+def probe_interval(channel: Dict, now: Optional[datetime] = None) -> timedelta:
+    """How long to wait after the last probe before probing again."""
+    streak = channel.get('fail_streak', 0)
+    if streak < BACKOFF_AFTER or channel.get('health_score', 1.0) >= DEAD_HEALTH:
+        return timedelta(0)
+    interval = RUN_INTERVAL * (2 ** (streak - BACKOFF_AFTER + 1))
+    last_seen = channel.get('last_seen')
+    if last_seen:
+        down_for = (now or datetime.now(timezone.utc)) - datetime.fromisoformat(last_seen)
+        interval = max(interval, down_for * DOWNTIME_SHARE)
+    return min(interval, MAX_INTERVAL)
+
+
+def is_due(channel: Dict, now: datetime) -> bool:
+    last_checked = channel.get('last_checked')
+    if not last_checked:
+        return True
+    interval = probe_interval(channel, now)
+    if not interval:
+        return True
+    # Small slack so a channel due "at" the next cron tick is not pushed a whole run
+    return now - datetime.fromisoformat(last_checked) >= interval - RUN_INTERVAL / 6
+
+
+def select_channels(channels: List[Dict], now: datetime, known_ids: Optional[set] = None, rng: Optional[random.Random] = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split channels into (to_probe, carried). Channels without a previous
+    status in `known_ids` are always probed, since there is nothing to carry.
+    """
+    rng = rng or random.Random()
+    to_probe, deferred = [], []
+    for ch in channels:
+        if is_due(ch, now) or (known_ids is not None and ch['id'] not in known_ids):
+            to_probe.append(ch)
+        else:
+            deferred.append(ch)
+    
+    recheck = min(len(deferred), math.ceil(len(deferred) * RECHECK_FRACTION))
+    if recheck:
+        picked = set(rng.sample(range(len(deferred)), recheck))
+        to_probe.extend(deferred[i] for i in sorted(picked))
+        deferred = [ch for i, ch in enumerate(deferred) if i not in picked]
+    
+    return to_probe, deferred
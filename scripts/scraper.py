@@ -1,6 +1,11 @@
 import sys
+import asyncio
+import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
 
 script_dir = Path(__file__).parent
 project_root = script_dir.parent
@@ -9,12 +14,65 @@ sys.path.insert(0, str(project_root))
 from utils import (
     get_project_root,
     load_sources,
-    fetch_playlist,
+    load_playlist_cache,
+    save_playlist_cache,
+    fetch_playlist_conditional,
     parse_playlist,
-    normalize_channel,
-    deduplicate_channels,
+    merge_catalog,
+    load_json,
+    save_json,
     save_channels_json,
+    PLAYLIST_HEADERS,
 )
+from metrics import RunMetrics
+import clusters
+
+
+async def scrape_source(session: aiohttp.ClientSession, source_url: str, metrics: Optional[RunMetrics] = None) -> Tuple[str, List[Dict]]:
+    metrics = metrics or RunMetrics('scraper')
+    labels = {'source': source_url}
+    cached = await asyncio.to_thread(load_playlist_cache, source_url)
+    start = time.monotonic()
+    state, entry = await fetch_playlist_conditional(session, source_url, cached)
+    metrics.set('source_fetch_seconds', time.monotonic() - start, labels)
+    
+    if state == 'failed':
+        print(f"  {source_url}: FAILED")
+        return state, []
+    
+    if state == 'unchanged' and entry.get('parsed') is not None:
+        print(f"  {source_url}: UNCHANGED ({len(entry['parsed'])} channels)")
+        metrics.set('source_channels', len(entry['parsed']), labels)
+        if entry is not cached:
+            await asyncio.to_thread(save_playlist_cache, source_url, entry)
+        return state, entry['parsed']
+    
+    if state == 'fetched':
+        metrics.inc('bytes_downloaded_total', len(entry['body'].encode('utf-8')))
+    
+    # Parsing is CPU-bound; run it off the event loop so other sources keep downloading.
+    start = time.monotonic()
+    channels = await asyncio.to_thread(parse_playlist, entry['body'], source_url)
+    parse_seconds = time.monotonic() - start
+    metrics.set('source_parse_seconds', parse_seconds, labels)
+    metrics.inc('stage_seconds', parse_seconds, {'stage': 'parse'})
+    metrics.set('source_channels', len(channels), labels)
+    print(f"  {source_url}: OK ({len(channels)} channels)")
+    
+    entry['parsed'] = channels
+    await asyncio.to_thread(save_playlist_cache, source_url, entry)
+    return 'fetched', channels
+
+
+async def scrape_sources_concurrent(sources: list, metrics: Optional[RunMetrics] = None) -> list:
+    metrics = metrics or RunMetrics('scraper')
+    connector = aiohttp.TCPConnector(limit=max(len(sources), 1), ttl_dns_cache=300)
+    
+    async with metrics.loop_lag(), aiohttp.ClientSession(connector=connector, headers=PLAYLIST_HEADERS) as session:
+        tasks = [scrape_source(session, url, metrics) for url in sources]
+        results = await asyncio.gather(*tasks)
+    
+    return results
 
 
 def main():
@@ -26,41 +84,50 @@ def main():
         sys.exit(1)
     
     now = datetime.now(timezone.utc).isoformat()
-    all_channels = []
-    success_count = 0
     
     print(f"Scraping {len(sources)} source(s)...")
     
-    for source_url in sources:
-        print(f"  Fetching {source_url}...", end='', flush=True)
-        content = fetch_playlist(source_url)
-        
-        if content is None:
-            print(" FAILED")
-            continue
-        
-        print(" OK")
-        
-        channels = parse_playlist(content, source_url)
-        print(f"    Parsed {len(channels)} channels")
-        
-        for ch in channels:
-            normalized = normalize_channel(ch, now, now)
-            all_channels.append(normalized)
-        
-        success_count += 1
-    
-    if success_count == 0:
+    metrics = RunMetrics('scraper')
+    # Sources download and parse concurrently; "fetch" is the wall time of both
+    with metrics.stage('fetch'):
+        results = asyncio.run(scrape_sources_concurrent(sources, metrics))
+    
+    parsed = []
+    failed_sources = set()
+    for source_url, (state, channels) in zip(sources, results):
+        if state == 'failed':
+            failed_sources.add(source_url)
+        parsed.extend(channels)
+    
+    if len(failed_sources) == len(sources):
         print("Error: All sources failed")
         sys.exit(1)
     
-    print(f"\nTotal channels before dedup: {len(all_channels)}")
-    all_channels = deduplicate_channels(all_channels)
-    print(f"Total channels after dedup: {len(all_channels)}")
-    
     output_file = root / "data" / "channels.json"
-    save_channels_json(all_channels, str(output_file))
-    print(f"Saved to {output_file}")
+    existing = load_json(str(output_file)) or []
+    
+    # merge_catalog normalizes new/changed entries and dedups by stream id in one pass
+    with metrics.stage('merge'):
+        catalog, changes = merge_catalog(existing, parsed, now, keep_sources=failed_sources)
+    print(f"\nParsed {len(parsed)} entries -> {len(catalog)} channels")
+    print(f"  Added: {len(changes['added'])}")
+    print(f"  Changed: {len(changes['changed'])}")
+    print(f"  Removed: {len(changes['removed'])}")
+    print(f"  Unchanged: {len(changes['unchanged'])}")
+    
+    with metrics.stage('write'):
+        written = save_channels_json(catalog, str(output_file))
+        save_json(changes, str(root / "data" / "changes.json"))
+        cluster_report = clusters.save_clusters(catalog)
+    print(f"Saved to {output_file}" if written else f"{output_file} unchanged, not rewritten")
+    print(f"  Clusters: {len(cluster_report['clusters'])}, covering {cluster_report['redundant']} redundant streams")
+    
+    metrics.set('run_channels', len(parsed), {'kind': 'parsed'})
+    metrics.set('run_channels', len(catalog), {'kind': 'catalog'})
+    metrics.set('run_channels', cluster_report['redundant'], {'kind': 'redundant'})
+    for kind in ('added', 'changed', 'removed'):
+        metrics.set('run_channels', len(changes[kind]), {'kind': kind})
+    print(f"Metrics written to {metrics.write()}")
     sys.exit(0)
 
 
@@ -0,0 +1,162 @@
+"""
+Prebuilt channel search index.
+
+An inverted index over the normalized name, group, language and category of
+every channel, published next to the site bundles as
+search.<catalog hash>.json. Keys are every trigram of each word, including
+the padded " xy" start.
+
+Every query word must appear somewhere inside a word of the record, as the
+old substring search did. Words of 3+ characters narrow the candidates
+(intersection of their trigram postings); 1-2 character words have no key
+of their own and are only checked against the candidates. A query made of
+short words alone ("tv 9") can't use the index, so `search` returns None
+and callers check every record. Postings are ascending document numbers
+stored as deltas, so most entries are small integers; `ids` maps document
+numbers back to channel ids. Trigram intersection can over-match, so
+callers check each candidate against its record (`matches`).
+
+The index only depends on the indexed fields and INDEX_VERSION, so
+publish.py skips the rebuild while `catalog_hash` is unchanged.
+
+    python scripts/search_index.py "zee news"
+"""
+import hashlib
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from utils import get_project_root, load_json
+import serialization
+
+
+INDEX_VERSION = 2
+INDEXED_FIELDS = ('name', 'group', 'language', 'category')
+
+
+def normalize_text(value: str) -> str:
+    """Lowercase, accents stripped, anything but letters and digits collapsed to one space."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    chars = []
+    for c in decomposed:
+        if unicodedata.category(c).startswith('M'):
+            continue
+        chars.append(c.lower() if c.isalnum() else ' ')
+    return ' '.join(''.join(chars).split())
+
+
+def document_text(channel: Dict) -> str:
+    return normalize_text(' '.join(str(channel.get(field) or '') for field in INDEXED_FIELDS))
+
+
+def word_keys(word: str) -> Set[str]:
+    padded = ' ' + word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def query_keys(word: str) -> Set[str]:
+    """Trigrams of a query word; none for 1-2 characters, which match anywhere in a word."""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def catalog_hash(channels: Iterable[Dict]) -> str:
+    """Digest of the index format and just the indexed fields, in id order."""
+    digest = hashlib.sha256(f'v{INDEX_VERSION}\n'.encode('utf-8'))
+    for channel in sorted(channels, key=lambda ch: ch['id']):
+        digest.update(channel['id'].encode('utf-8'))
+        digest.update(document_text(channel).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+
+def encode_postings(docs: List[int]) -> List[int]:
+    previous = 0
+    deltas = []
+    for doc in docs:
+        deltas.append(doc - previous)
+        previous = doc
+    return deltas
+
+
+def decode_postings(deltas: List[int]) -> List[int]:
+    docs = []
+    total = 0
+    for delta in deltas:
+        total += delta
+        docs.append(total)
+    return docs
+
+
+def build_index(channels: List[Dict]) -> Dict:
+    ordered = sorted(channels, key=lambda ch: ch['id'])
+    postings: Dict[str, List[int]] = {}
+    for doc, channel in enumerate(ordered):
+        keys = set()
+        for word in document_text(channel).split():
+            keys |= word_keys(word)
+        for key in keys:
+            # Documents are visited in order, so each list stays sorted
+            postings.setdefault(key, []).append(doc)
+    return {
+        'version': INDEX_VERSION,
+        'catalog_hash': catalog_hash(ordered),
+        'ids': [ch['id'] for ch in ordered],
+        'postings': {key: encode_postings(docs) for key, docs in sorted(postings.items())},
+    }
+
+
+def search(index: Dict, query: str) -> Optional[List[str]]:
+    """Candidate channel ids for a query, or None when no query word is long enough to narrow them."""
+    keys = set()
+    for word in normalize_text(query).split():
+        keys |= query_keys(word)
+    if not keys:
+        return None
+    lists = []
+    for key in keys:
+        deltas = index['postings'].get(key)
+        if deltas is None:
+            return []
+        lists.append(deltas)
+    # Intersect from the rarest key, so the work tracks the smallest posting list
+    lists.sort(key=len)
+    candidates = set(decode_postings(lists[0]))
+    for deltas in lists[1:]:
+        candidates.intersection_update(decode_postings(deltas))
+        if not candidates:
+            return []
+    ids = index['ids']
+    return [ids[doc] for doc in sorted(candidates)]
+
+
+def matches(channel: Dict, query: str) -> bool:
+    """Exact check for a candidate: each query word is inside some word of the record."""
+    words = document_text(channel).split()
+    return all(any(term in word for word in words) for term in normalize_text(query).split())
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('usage: python scripts/search_index.py "query"')
+        sys.exit(1)
+    root = get_project_root()
+    channels = load_json(str(root / 'data' / 'channels.json')) or []
+    by_id = {ch['id']: ch for ch in channels}
+    query = ' '.join(sys.argv[1:])
+    index = build_index(channels)
+    candidates = search(index, query)
+    if candidates is None:
+        candidates = index['ids']
+    found = [by_id[cid] for cid in candidates if matches(by_id[cid], query)]
+    for channel in found:
+        print(f"{channel['id']}  {channel['name']}  [{channel.get('category')}/{channel.get('language')}]")
+    print(f"{len(found)} match(es) ({len(index['postings'])} keys, {len(serialization.dumps(index)) / 1024:.1f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+One place for catalog and status (de)serialization.
+
+    dump(obj, path)       encode and write atomically (temp file, fsync, rename)
+    dump_if_changed       same, but leaves a byte-identical file alone
+    load(path)            read and decode; None if the file does not exist
+    iter_items(path)      stream the elements of a top-level array
+    dumps_line/loads      single NDJSON records
+
+The encoding follows the file name: *.json is JSON, *.msgpack is MessagePack,
+and a trailing .zst adds zstd compression (channels.json.zst). JSON is
+encoded with orjson when it is installed and the stdlib otherwise;
+CIW_JSON_BACKEND=json|orjson forces one. Output is compact unless
+`indent=True`. msgpack and zstandard are optional imports, only needed for
+those file types.
+
+A reader never sees a partial file: the data goes to a temp file in the same
+directory, is fsynced and then renamed over the target.
+"""
+import codecs
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ZSTD_LEVEL = 3
+STREAM_CHUNK = 1 << 16
+
+PathLike = Union[str, Path]
+
+
+def json_backend() -> str:
+    forced = os.environ.get('CIW_JSON_BACKEND')
+    if forced in ('json', 'orjson'):
+        if forced == 'orjson' and orjson is None:
+            raise RuntimeError("CIW_JSON_BACKEND=orjson but orjson is not installed")
+        return forced
+    return 'orjson' if orjson is not None else 'json'
+
+
+def file_format(path: PathLike) -> tuple:
+    """(format, compressed) from the file name."""
+    suffixes = Path(path).suffixes
+    compressed = bool(suffixes) and suffixes[-1] == '.zst'
+    if compressed:
+        suffixes = suffixes[:-1]
+    fmt = 'msgpack' if suffixes and suffixes[-1] == '.msgpack' else 'json'
+    return fmt, compressed
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """JSON as UTF-8 bytes."""
+    if json_backend() == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if json_backend() == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_line(record: Any) -> str:
+    """One NDJSON line, newline included."""
+    return dumps(record).decode('utf-8') + '\n'
+
+
+def _require(module, name: str):
+    if module is None:
+        raise RuntimeError(f"{name} is not installed (pip install {name})")
+    return module
+
+
+def encode(obj: Any, path: PathLike, indent: bool = False) -> bytes:
+    fmt, compressed = file_format(path)
+    if fmt == 'msgpack':
+        data = _require(msgpack, 'msgpack').packb(obj, use_bin_type=True)
+    else:
+        data = dumps(obj, indent=indent)
+    if compressed:
+        data = _require(zstandard, 'zstandard').ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+
+def decode(data: bytes, path: PathLike) -> Any:
+    fmt, compressed = file_format(path)
+    if compressed:
+        data = _require(zstandard, 'zstandard').ZstdDecompressor().decompress(data)
+    if fmt == 'msgpack':
+        return _require(msgpack, 'msgpack').unpackb(data, raw=False)
+    return loads(data)
+
+
+def write_atomic(path: PathLike, data: Union[bytes, str]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    # Make the rename itself durable
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def dump(obj: Any, path: PathLike, indent: bool = False):
+    write_atomic(path, encode(obj, path, indent=indent))
+
+
+def dump_if_changed(obj: Any, path: PathLike, indent: bool = False) -> bool:
+    """dump() unless the file already holds exactly these bytes; returns whether it wrote."""
+    data = encode(obj, path, indent=indent)
+    path = Path(path)
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    write_atomic(path, data)
+    return True
+
+
+def load(path: PathLike) -> Optional[Any]:
+    path = Path(path)
+    if not path.exists():
+        return None
+    return decode(path.read_bytes(), path)
+
+
+def _open_stream(path: Path):
+    _, compressed = file_format(path)
+    raw = open(path, 'rb')
+    if not compressed:
+        return raw
+    return _require(zstandard, 'zstandard').ZstdDecompressor().stream_reader(raw, closefd=True)
+
+
+def iter_items(path: PathLike) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level array one at a time, reading the file in
+    chunks, so a large catalog never has to be decoded as a whole.
+    """
+    path = Path(path)
+    fmt, _ = file_format(path)
+    with _open_stream(path) as f:
+        if fmt == 'msgpack':
+            unpacker = _require(msgpack, 'msgpack').Unpacker(f, raw=False)
+            for _ in range(unpacker.read_array_header()):
+                yield unpacker.unpack()
+            return
+        
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        text = ''
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Skip whitespace, the opening bracket and separators up to the next element
+            while pos < len(text):
+                c = text[pos]
+                if c in ' \t\r\n' or (c == ',' and started):
+                    pos += 1
+                elif c == '[' and not started:
+                    started = True
+                    pos += 1
+                elif c == ']' and started:
+                    return
+                else:
+                    break
+            if started and pos < len(text):
+                try:
+                    item, end = decoder.raw_decode(text, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                else:
+                    # A number at the buffer's end may continue in the next chunk
+                    if end < len(text) or eof:
+                        yield item
+                        pos = end
+                        continue
+            elif pos < len(text):
+                raise ValueError(f"{path} does not hold a JSON array")
+            if eof:
+                return
+            chunk = f.read(STREAM_CHUNK)
+            eof = not chunk
+            text = text[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
@@ -0,0 +1,289 @@
+"""
+Columnar status history store.
+
+Each checker run is appended to a set of flat little-endian column files
+under data/history/. Channels are interned once in a channel dictionary, so
+a run costs 16 bytes per channel instead of a pretty-printed JSON object:
+
+    channels.json   channel dictionary: [[id, name, stream_url], ...]
+    runs.json       one entry per run: timestamp, row offset, row count
+    chan.u4         channel index           (uint32)
+    status.u1       STATUS_CODES value      (uint8)
+    http_code.u2    HTTP status, 0 if none  (uint16)
+    resp_time.f4    resp_time_ms, NaN if none (float32)
+    playable.u1     browser_playable bit    (uint8)
+    checked_at.u4   unix seconds            (uint32)
+
+Rows of a run are contiguous and sorted by channel index, so "all statuses
+at run T" is one slice and "history for id X" is a binary search per run
+over memory-mapped columns.
+
+`drop_runs_before` (called by rollup.py) rewrites the columns without old
+runs. The new columns and runs.json are written next to the old ones as
+*.new files; runs.json.new is the commit point, and opening the store
+finishes or discards an interrupted rewrite.
+
+    python scripts/status_store.py import data/status/2026-*.json
+    python scripts/status_store.py history 1577473a82d5816f
+    python scripts/status_store.py run -1
+"""
+import argparse
+import json
+import math
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils import get_project_root
+import serialization
+
+
+STATUS_CODES = {'unknown': 0, 'live': 1, 'slow': 2, 'unstable': 3, 'dead': 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+COLUMNS = {
+    'chan': np.dtype('<u4'),
+    'status': np.dtype('<u1'),
+    'http_code': np.dtype('<u2'),
+    'resp_time': np.dtype('<f4'),
+    'playable': np.dtype('<u1'),
+    'checked_at': np.dtype('<u4'),
+}
+COLUMN_FILES = {
+    'chan': 'chan.u4',
+    'status': 'status.u1',
+    'http_code': 'http_code.u2',
+    'resp_time': 'resp_time.f4',
+    'playable': 'playable.u1',
+    'checked_at': 'checked_at.u4',
+}
+
+
+def get_history_dir() -> Path:
+    return get_project_root() / "data" / "history"
+
+
+def to_epoch(timestamp: Optional[str]) -> int:
+    if not timestamp:
+        return 0
+    return int(datetime.fromisoformat(timestamp).timestamp())
+
+
+def from_epoch(seconds: int) -> Optional[str]:
+    if not seconds:
+        return None
+    return datetime.fromtimestamp(int(seconds), timezone.utc).isoformat()
+
+
+class StatusHistory:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_history_dir()
+        self._columns = None
+        self._recover()
+        self.channels = serialization.load(self.path / 'channels.json') or []
+        self.runs = serialization.load(self.path / 'runs.json') or []
+        self._index = {entry[0]: i for i, entry in enumerate(self.channels)}
+    
+    @property
+    def row_count(self) -> int:
+        if not self.runs:
+            return 0
+        last = self.runs[-1]
+        return last['offset'] + last['count']
+    
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Memory-map every column, trimmed to the committed row count."""
+        if self._columns is None:
+            rows = self.row_count
+            self._columns = {}
+            for name, dtype in COLUMNS.items():
+                path = self.path / COLUMN_FILES[name]
+                if rows == 0 or not path.exists():
+                    self._columns[name] = np.zeros(0, dtype=dtype)
+                else:
+                    self._columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+        return self._columns
+    
+    def _recover(self):
+        """Finish a rewrite whose runs.json.new made it to disk; drop one that didn't."""
+        committed = (self.path / 'runs.json.new').exists()
+        for name in COLUMN_FILES.values():
+            pending = self.path / f"{name}.new"
+            if pending.exists():
+                if committed:
+                    os.replace(pending, self.path / name)
+                else:
+                    pending.unlink()
+        if committed:
+            os.replace(self.path / 'runs.json.new', self.path / 'runs.json')
+    
+    def channel_index(self, channel_id: str) -> Optional[int]:
+        return self._index.get(channel_id)
+    
+    def _intern(self, record: Dict) -> int:
+        i = self._index.get(record['id'])
+        if i is None:
+            i = len(self.channels)
+            self.channels.append([record['id'], record.get('name'), record.get('stream_url')])
+            self._index[record['id']] = i
+        return i
+    
+    def append_run(self, records: Iterable[Dict], run_at: Optional[str] = None, source: Optional[str] = None) -> int:
+        """Append one checker run; returns its run number."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        rows = []
+        for record in records:
+            if not record.get('id'):
+                continue
+            resp_time = record.get('resp_time_ms')
+            rows.append((
+                self._intern(record),
+                STATUS_CODES.get(record.get('status'), 0),
+                record.get('http_code') or 0,
+                math.nan if resp_time is None else resp_time,
+                1 if record.get('browser_playable') else 0,
+                to_epoch(record.get('checked_at')),
+            ))
+        rows.sort(key=lambda row: row[0])
+        
+        # Drop anything past the last committed run (e.g. a crash mid-append)
+        offset = self.row_count
+        for i, (name, dtype) in enumerate(COLUMNS.items()):
+            path = self.path / COLUMN_FILES[name]
+            with open(path, 'ab') as f:
+                f.truncate(offset * dtype.itemsize)
+                if rows:
+                    values = np.array([row[i] for row in rows], dtype=dtype)
+                    f.write(values.tobytes())
+                # Rows must be on disk before runs.json points at them
+                f.flush()
+                os.fsync(f.fileno())
+        
+        if run_at is None:
+            run_at = datetime.now(timezone.utc).isoformat()
+        entry = {'run': self.runs[-1]['run'] + 1 if self.runs else 0, 'run_at': run_at, 'offset': offset, 'count': len(rows)}
+        if source:
+            entry['source'] = source
+        self.runs.append(entry)
+        
+        serialization.dump(self.channels, self.path / 'channels.json')
+        # runs.json is the commit point: rows beyond it are ignored on read
+        serialization.dump(self.runs, self.path / 'runs.json')
+        
+        self._columns = None
+        return entry['run']
+    
+    def drop_runs_before(self, cutoff: str) -> int:
+        """Remove every run older than `cutoff` (ISO timestamp); returns how many went."""
+        cutoff_epoch = to_epoch(cutoff)
+        keep = [run for run in self.runs if to_epoch(run['run_at']) >= cutoff_epoch]
+        if len(keep) == len(self.runs):
+            return 0
+        
+        columns = self.columns()
+        runs = []
+        offset = 0
+        for run in keep:
+            runs.append(dict(run, offset=offset))
+            offset += run['count']
+        for name, dtype in COLUMNS.items():
+            values = [columns[name][run['offset']:run['offset'] + run['count']] for run in keep]
+            with open(self.path / f"{COLUMN_FILES[name]}.new", 'wb') as f:
+                if values:
+                    f.write(np.concatenate(values).astype(dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        
+        # runs.json.new commits the rewrite; _recover moves everything into place
+        serialization.dump(runs, self.path / 'runs.json.new')
+        self._columns = None
+        self._recover()
+        dropped = len(self.runs) - len(runs)
+        self.runs = runs
+        return dropped
+    
+    def _row(self, columns: Dict[str, np.ndarray], row: int, run: Dict) -> Dict:
+        channel_id, name, stream_url = self.channels[int(columns['chan'][row])]
+        resp_time = float(columns['resp_time'][row])
+        return {
+            'id': channel_id,
+            'name': name,
+            'stream_url': stream_url,
+            'status': STATUS_NAMES.get(int(columns['status'][row]), 'unknown'),
+            'http_code': int(columns['http_code'][row]) or None,
+            'resp_time_ms': None if math.isnan(resp_time) else round(resp_time, 2),
+            'browser_playable': bool(columns['playable'][row]),
+            'checked_at': from_epoch(columns['checked_at'][row]),
+            'run': run['run'],
+        }
+    
+    def statuses_at(self, run: int) -> List[Dict]:
+        """All records of one run (negative numbers count from the end)."""
+        if not self.runs:
+            return []
+        entry = self.runs[run]
+        columns = self.columns()
+        return [self._row(columns, row, entry) for row in range(entry['offset'], entry['offset'] + entry['count'])]
+    
+    def history(self, channel_id: str) -> List[Dict]:
+        """Every recorded status for one channel, oldest first."""
+        target = self.channel_index(channel_id)
+        if target is None:
+            return []
+        columns = self.columns()
+        chan = columns['chan']
+        result = []
+        for entry in self.runs:
+            start, end = entry['offset'], entry['offset'] + entry['count']
+            row = start + int(np.searchsorted(chan[start:end], target))
+            if row < end and chan[row] == target:
+                result.append(self._row(columns, row, entry))
+        return result
+
+
+def import_status_files(store: StatusHistory, paths: Iterable[Path]) -> int:
+    """Import legacy daily status JSON files, skipping ones already imported."""
+    imported = {run.get('source') for run in store.runs}
+    count = 0
+    for path in sorted(Path(p) for p in paths):
+        if path.name == 'latest.json' or path.name in imported:
+            continue
+        records = serialization.load(path)
+        if not isinstance(records, list):
+            continue
+        checked = [r['checked_at'] for r in records if r.get('checked_at')]
+        run_at = max(checked) if checked else f"{path.stem}T00:00:00+00:00"
+        store.append_run(records, run_at=run_at, source=path.name)
+        count += 1
+        print(f"  Imported {path.name}: {len(records)} records")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar status history store")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_import = sub.add_parser('import', help="import daily status JSON files")
+    p_import.add_argument('files', nargs='*')
+    p_history = sub.add_parser('history', help="status history for a channel id")
+    p_history.add_argument('channel_id')
+    p_run = sub.add_parser('run', help="all statuses of one run")
+    p_run.add_argument('run', type=int)
+    args = parser.parse_args()
+    
+    store = StatusHistory()
+    
+    if args.command == 'import':
+        files = args.files or sorted((get_project_root() / "data" / "status").glob('*.json'))
+        count = import_status_files(store, files)
+        print(f"Imported {count} run(s); store holds {len(store.runs)} runs, {store.row_count} rows")
+    elif args.command == 'history':
+        print(json.dumps(store.history(args.channel_id), indent=2, ensure_ascii=False))
+    elif args.command == 'run':
+        print(json.dumps(store.statuses_at(args.run), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,18 @@
 # scripts/utils.py
+import asyncio
 import hashlib
 import json
+import math
+import random
 import re
-import requests
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import aiohttp
+
+import serialization
 
 
 MANUAL_CLASSIFICATION = [
@@ -528,6 +535,107 @@ def get_project_root() -> Path:
     return Path(__file__).resolve().parent.parent
 
 
+class ClassificationIndex:
+    """
+    Compiled form of a classification rule list.
+    
+    Keeps the priority order of the original linear scans (exact match, then
+    startsWith, then includes; the earliest rule wins within each pass) but
+    answers each pass with hash lookups and an Aho-Corasick automaton.
+    """
+    
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        # lowered match -> index of the first rule using it
+        self.rank = {}
+        for i, entry in enumerate(rules):
+            self.rank.setdefault(entry["match"].lower(), i)
+        self.prefix_lengths = sorted({len(key) for key in self.rank})
+        self._build_automaton()
+    
+    def _build_automaton(self):
+        no_match = len(self.rules)
+        goto = [{}]
+        fail = [0]
+        best = [no_match]
+        
+        for key, i in self.rank.items():
+            node = 0
+            for char in key:
+                nxt = goto[node].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][char] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    best.append(no_match)
+                node = nxt
+            best[node] = min(best[node], i)
+        
+        # Breadth-first so every fail target is finished before its dependants.
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in goto[node].items():
+                f = fail[node]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(char, 0)
+                fail[child] = target if target != child else 0
+                best[child] = min(best[child], best[fail[child]])
+                queue.append(child)
+        
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+    
+    def _exact(self, name_lower: str) -> Optional[int]:
+        return self.rank.get(name_lower)
+    
+    def _prefix(self, name_lower: str) -> Optional[int]:
+        found = None
+        for length in self.prefix_lengths:
+            if length > len(name_lower):
+                break
+            i = self.rank.get(name_lower[:length])
+            if i is not None and (found is None or i < found):
+                found = i
+        return found
+    
+    def _substring(self, name_lower: str) -> Optional[int]:
+        goto, fail, best = self._goto, self._fail, self._best
+        node = 0
+        found = best[0]
+        for char in name_lower:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if best[node] < found:
+                found = best[node]
+        return found if found < len(self.rules) else None
+    
+    def lookup(self, name: str) -> Optional[Dict]:
+        name_lower = name.lower()
+        for match in (self._exact, self._prefix, self._substring):
+            i = match(name_lower)
+            if i is not None:
+                return self.rules[i]
+        return None
+
+
+_classification_index = None
+
+
+@lru_cache(maxsize=65536)
+def _classify_name(name: str) -> Optional[Dict]:
+    global _classification_index
+    if _classification_index is None:
+        _classification_index = ClassificationIndex(MANUAL_CLASSIFICATION)
+    return _classification_index.lookup(name)
+
+
 def get_manual_classification(name: str) -> Optional[Dict]:
     """
     Get manual classification for a channel by name.
@@ -536,25 +644,7 @@ def get_manual_classification(name: str) -> Optional[Dict]:
     """
     if not name:
         return None
-    
-    name_lower = name.lower()
-    
-    # Exact match (case-insensitive)
-    for entry in MANUAL_CLASSIFICATION:
-        if name_lower == entry["match"].lower():
-            return entry
-    
-    # startsWith
-    for entry in MANUAL_CLASSIFICATION:
-        if name_lower.startswith(entry["match"].lower()):
-            return entry
-    
-    # includes
-    for entry in MANUAL_CLASSIFICATION:
-        if entry["match"].lower() in name_lower:
-            return entry
-    
-    return None
+    return _classify_name(name)
 
 
 def load_sources() -> List[str]:
@@ -569,101 +659,205 @@ def load_sources() -> List[str]:
     return sources
 
 
-def fetch_playlist(url: str, max_retries: int = 3, timeout: int = 15) -> Optional[str]:
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
+PLAYLIST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+
+def get_playlist_cache_file(url: str) -> Path:
+    cache_dir = get_project_root() / "data" / "cache" / "playlists"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / f"{generate_id(url)}.json"
+
+
+def load_playlist_cache(url: str) -> Optional[Dict]:
+    """Load the cached body, validators and parse result for a source."""
+    path = get_playlist_cache_file(url)
+    if not path.exists():
+        return None
+    try:
+        entry = serialization.load(path)
+    except (OSError, ValueError):
+        return None
+    if entry.get('url') != url:
+        return None
+    return entry
+
+
+def save_playlist_cache(url: str, entry: Dict):
+    serialization.dump(entry, get_playlist_cache_file(url))
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff delay, in seconds, before retry `attempt + 1`."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def fetch_playlist_conditional(session: aiohttp.ClientSession, url: str, cached: Optional[Dict] = None, max_retries: int = 3, timeout: int = 15) -> Tuple[str, Optional[Dict]]:
+    """
+    Fetch a playlist, revalidating against a cached entry when one is given.
+    Returns (state, entry) where state is 'fetched', 'unchanged' or 'failed'.
+    A 304, or a 200 whose body hashes the same as the cached one, counts as
+    'unchanged' and returns the cached entry.
+    """
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-            response.raise_for_status()
-            
-            content_type = response.headers.get('Content-Type', '').lower()
-            if not any(x in content_type for x in ['mpegurl', 'm3u', 'text']):
-                print(f"Warning: Unexpected Content-Type for {url}: {content_type}")
-            
-            text = response.text
-            if '#EXTM3U' not in text[:2048]:
-                print(f"Rejected non-M3U source: {url}")
-                return None
-            
-            return text
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout), allow_redirects=True) as response:
+                if response.status == 304 and cached:
+                    return 'unchanged', cached
+                response.raise_for_status()
+                
+                content_type = response.headers.get('Content-Type', '').lower()
+                if not any(x in content_type for x in ['mpegurl', 'm3u', 'text']):
+                    print(f"Warning: Unexpected Content-Type for {url}: {content_type}")
+                
+                text = await response.text(errors='replace')
+                if '#EXTM3U' not in text[:2048]:
+                    print(f"Rejected non-M3U source: {url}")
+                    return 'failed', None
+                
+                body_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                if cached and cached.get('body_hash') == body_hash:
+                    # Same body without a 304: hand back a copy carrying the new
+                    # validators so the caller knows to persist them.
+                    return 'unchanged', {
+                        **cached,
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified')
+                    }
+                
+                return 'fetched', {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'body_hash': body_hash,
+                    'body': text,
+                    'fetched_at': datetime.now(timezone.utc).isoformat(),
+                    'parsed': None
+                }
         except Exception:
             if attempt < max_retries - 1:
+                await asyncio.sleep(backoff_delay(attempt))
                 continue
-            return None
-    return None
+            return 'failed', None
+    return 'failed', None
+
+
+# key="value" pairs on an #EXTINF line (tvg-id, tvg-logo, group-title, user-agent, ...)
+EXTINF_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+# Everything up to the first comma that is not inside a quoted attribute value
+EXTINF_HEADER_RE = re.compile(r'[^",]*(?:"[^"]*"[^",]*)*')
+
+# #EXTVLCOPT keys that map onto request headers
+VLCOPT_HEADERS = {
+    'http-user-agent': 'User-Agent',
+    'http-referrer': 'Referer',
+    'http-referer': 'Referer',
+    'http-origin': 'Origin',
+}
+
+
+def iter_lines(content: str) -> Iterator[str]:
+    """Yield the lines of `content` one at a time without building a list."""
+    start = 0
+    find = content.find
+    while True:
+        end = find('\n', start)
+        if end == -1:
+            yield content[start:]
+            return
+        yield content[start:end]
+        start = end + 1
 
 
 def parse_extinf_line(line: str) -> Tuple[Dict[str, str], Optional[str]]:
     if not line.startswith('#EXTINF:'):
         return {}, None
     
-    parts = line.split(',', 1)
-    if len(parts) != 2:
+    comma = line.find(',', 8)
+    if comma == -1:
         return {}, None
+    if line.count('"', 8, comma) % 2:
+        # The first comma sits inside a quoted value (e.g. group-title="A,B")
+        end = EXTINF_HEADER_RE.match(line, 8).end()
+        if end < len(line) and line[end] == ',':
+            comma = end
+    header = line[8:comma]
     
-    header = parts[0]
-    name = parts[1].strip()
-    attrs = {}
-    
-    match = re.search(r'tvg-id="([^"]*)"', header)
-    if match:
-        attrs['tvg-id'] = match.group(1)
-    
-    match = re.search(r'tvg-name="([^"]*)"', header)
-    if match:
-        attrs['tvg-name'] = match.group(1)
-    
-    match = re.search(r'tvg-logo="([^"]*)"', header)
-    if match:
-        attrs['tvg-logo'] = match.group(1)
-    
-    match = re.search(r'group-title="([^"]*)"', header)
-    if match:
-        attrs['group-title'] = match.group(1)
-    
+    attrs = dict(EXTINF_ATTR_RE.findall(header))
+    name = line[comma + 1:].strip()
     return attrs, name
 
 
-def parse_playlist(content: str, source_url: str) -> List[Dict]:
-    channels = []
-    lines = content.split('\n')
-    i = 0
+def iter_playlist(content: Union[str, Iterable[str]], source_url: str) -> Iterator[Dict]:
+    """
+    Stream channel records out of an M3U playlist in a single pass.
+    Accepts the playlist text or any iterable of lines (e.g. an open file).
+    Per-stream HTTP options from #EXTVLCOPT, #EXTHTTP and the EXTINF
+    user-agent/referrer attributes are collected into 'http_headers'.
+    """
+    lines = iter_lines(content) if isinstance(content, str) else content
+    pending = None
+    headers = {}
     
-    while i < len(lines):
-        line = lines[i].strip()
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
         
-        if line.startswith('#EXTINF:'):
-            attrs, name = parse_extinf_line(line)
-            
-            i += 1
-            while i < len(lines):
-                stream_url = lines[i].strip()
-                if stream_url and not stream_url.startswith('#'):
-                    break
-                i += 1
-            
-            if i >= len(lines) or not stream_url:
-                continue
-            
-            if not (stream_url.startswith('http://') or stream_url.startswith('https://')):
-                i += 1
-                continue
-            
-            channel = {
-                'name': name or 'Unknown',
-                'stream_url': stream_url,
-                'logo': attrs.get('tvg-logo', None),
-                'group': attrs.get('group-title', None),
-                'source_file': source_url,
-                'attrs': attrs
-            }
-            channels.append(channel)
+        if line.startswith('#'):
+            if line.startswith('#EXTINF:'):
+                pending = parse_extinf_line(line)
+                headers = {}
+            elif pending is not None and line.startswith('#EXTVLCOPT:'):
+                key, _, value = line[11:].partition('=')
+                header = VLCOPT_HEADERS.get(key.strip().lower())
+                if header and value.strip():
+                    headers[header] = value.strip()
+            elif pending is not None and line.startswith('#EXTHTTP:'):
+                try:
+                    extra = json.loads(line[9:])
+                except ValueError:
+                    extra = None
+                if isinstance(extra, dict):
+                    headers.update({k.title(): str(v) for k, v in extra.items()})
+            continue
         
-        i += 1
-    
-    return channels
+        if pending is None:
+            continue
+        attrs, name = pending
+        pending = None
+        
+        if not (line.startswith('http://') or line.startswith('https://')):
+            continue
+        
+        if 'user-agent' in attrs and 'User-Agent' not in headers:
+            headers['User-Agent'] = attrs['user-agent']
+        if 'http-referrer' in attrs and 'Referer' not in headers:
+            headers['Referer'] = attrs['http-referrer']
+        
+        channel = {
+            'name': name or 'Unknown',
+            'stream_url': line,
+            'logo': attrs.get('tvg-logo', None),
+            'group': attrs.get('group-title', None),
+            'source_file': source_url,
+            'attrs': attrs
+        }
+        if headers:
+            channel['http_headers'] = headers
+        yield channel
+
+
+def parse_playlist(content: Union[str, Iterable[str]], source_url: str) -> List[Dict]:
+    return list(iter_playlist(content, source_url))
 
 
 def generate_id(stream_url: str) -> str:
@@ -733,25 +927,26 @@ def normalize_category(name: str, group: str) -> str:
     return 'Entertainment'
 
 
+def classify_channel_name(name: str) -> Tuple[str, str]:
+    """(language, category); use manual classification if available, otherwise Unknown/Other."""
+    manual = get_manual_classification(name)
+    if manual:
+        return manual["language"], manual["category"]
+    return "Unknown", "Other"
+
+
 def normalize_channel(channel: Dict, first_seen: str, last_seen: str) -> Dict:
     name = channel['name']
     group = channel['group'] or ''
+    language, category = classify_channel_name(name)
     
-    # Use manual classification if available, otherwise use Unknown/Other
-    manual = get_manual_classification(name)
-    if manual:
-        language = manual["language"]
-        category = manual["category"]
-    else:
-        language = "Unknown"
-        category = "Other"
-    
-    return {
+    record = {
         'id': generate_id(channel['stream_url']),
         'name': name,
         'language': language,
         'country': 'India',
         'logo': channel['logo'] if channel['logo'] else None,
+        'tvg_id': (channel.get('attrs') or {}).get('tvg-id') or None,
         'group': group,
         'category': category,
         'source_file': channel['source_file'],
@@ -762,6 +957,9 @@ def normalize_channel(channel: Dict, first_seen: str, last_seen: str) -> Dict:
         'last_seen': last_seen,
         'health_score': 1.0
     }
+    if channel.get('http_headers'):
+        record['http_headers'] = channel['http_headers']
+    return record
 
 
 def deduplicate_channels(channels: List[Dict]) -> List[Dict]:
@@ -775,25 +973,97 @@ def deduplicate_channels(channels: List[Dict]) -> List[Dict]:
     return unique
 
 
-def save_channels_json(channels: List[Dict], output_file: str):
+# Fields owned by the checker rather than the scraper; carried over when a
+# channel's playlist entry changes.
+CATALOG_HISTORY_FIELDS = ('first_seen', 'last_seen', 'health_score', 'browser_playable', 'fail_streak', 'last_checked')
+
+
+def channel_changed(existing: Dict, parsed: Dict) -> bool:
+    """Whether a parsed playlist entry differs from its catalog record."""
+    return (
+        existing.get('name') != parsed['name'] or
+        existing.get('logo') != (parsed['logo'] or None) or
+        existing.get('tvg_id') != ((parsed.get('attrs') or {}).get('tvg-id') or None) or
+        existing.get('group') != (parsed['group'] or '') or
+        existing.get('source_file') != parsed['source_file'] or
+        existing.get('http_headers') != parsed.get('http_headers')
+    )
+
+
+def merge_catalog(existing: List[Dict], parsed: List[Dict], now: str, keep_sources: Optional[set] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Upsert parsed playlist entries into the existing catalog, keyed by
+    generate_id(stream_url). Only new or changed entries are normalized;
+    unchanged records are kept so checker history survives, but are still
+    re-classified so edits to MANUAL_CLASSIFICATION reach them. Records
+    from `keep_sources` (e.g. sources that failed to fetch) are retained.
+    Returns (catalog, changes).
+    """
+    existing_by_id = {ch['id']: ch for ch in existing}
+    keep_sources = keep_sources or set()
+    catalog = []
+    seen = set()
+    added, changed, unchanged = [], [], []
+    
+    for ch in parsed:
+        channel_id = generate_id(ch['stream_url'])
+        if channel_id in seen:
+            continue
+        seen.add(channel_id)
+        
+        old = existing_by_id.get(channel_id)
+        if old is not None and not channel_changed(old, ch):
+            language, category = classify_channel_name(old['name'])
+            if old.get('language') == language and old.get('category') == category:
+                catalog.append(old)
+                unchanged.append(channel_id)
+            else:
+                catalog.append(dict(old, language=language, category=category))
+                changed.append(channel_id)
+            continue
+        
+        record = normalize_channel(ch, now, now)
+        if old is None:
+            added.append(channel_id)
+        else:
+            for field in CATALOG_HISTORY_FIELDS:
+                if field in old:
+                    record[field] = old[field]
+            changed.append(channel_id)
+        catalog.append(record)
+    
+    removed = []
+    for channel_id, old in existing_by_id.items():
+        if channel_id in seen:
+            continue
+        if old.get('source_file') in keep_sources:
+            catalog.append(old)
+            unchanged.append(channel_id)
+        else:
+            removed.append(channel_id)
+    
+    changes = {
+        'generated_at': now,
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'unchanged': unchanged
+    }
+    return catalog, changes
+
+
+def save_channels_json(channels: List[Dict], output_file: str) -> bool:
+    """Write the catalog sorted by name; an identical file is left alone. Returns whether it wrote."""
     sorted_channels = sorted(channels, key=lambda x: x['name'].lower())
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(sorted_channels, f, indent=2, ensure_ascii=False)
+    return serialization.dump_if_changed(sorted_channels, output_file)
 
 
 def load_json(path: str) -> Optional[List[Dict]]:
-    path_obj = Path(path)
-    if not path_obj.exists():
-        return None
-    with open(path_obj, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return serialization.load(path)
 
 
 def save_json(obj: List[Dict], path: str):
-    path_obj = Path(path)
-    path_obj.parent.mkdir(parents=True, exist_ok=True)
-    with open(path_obj, 'w', encoding='utf-8') as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+    serialization.dump(obj, path)
 
 
 def get_daily_status_file() -> Path:
@@ -803,6 +1073,44 @@ def get_daily_status_file() -> Path:
     return status_dir / f"{date.today().isoformat()}.json"
 
 
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of `values`, or None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+class Histogram:
+    """
+    Log-bucketed histogram for streaming percentiles: constant memory however
+    many values are added, about 1% relative error. Zero and negative values
+    share one bucket that reports 0.
+    """
+    GROWTH = 1.02
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+    
+    def add(self, value: float):
+        bucket = None if value <= 0 else int(math.floor(math.log(value) / math.log(self.GROWTH)))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, like percentile() over the raw values."""
+        if not self.total:
+            return None
+        rank = min(self.total - 1, int(round(pct / 100 * (self.total - 1))))
+        seen = 0
+        for bucket in sorted(self.counts, key=lambda b: -math.inf if b is None else b):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return 0.0 if bucket is None else round(self.GROWTH ** (bucket + 0.5), 2)
+
+
 def classify_stream(http_code: int, resp_time_ms: float, content_type: str, head_success: bool, get_success: bool) -> str:
     if http_code >= 400 or not head_success:
         return "dead"
@@ -852,7 +1160,15 @@ def update_health_score(channel: Dict, status: str) -> Dict:
     
     channel['health_score'] = score
     
+    now = datetime.now(timezone.utc).isoformat()
     if status in ['live', 'slow']:
-        channel['last_seen'] = datetime.now(timezone.utc).isoformat()
+        channel['last_seen'] = now
+    
+    # Consecutive dead probes drive the probe backoff in scheduler.py
+    if status == 'dead':
+        channel['fail_streak'] = channel.get('fail_streak', 0) + 1
+    else:
+        channel['fail_streak'] = 0
+    channel['last_checked'] = now
     
     return channel
\ No newline at end of file
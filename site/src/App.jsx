@@ -1,14 +1,32 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useMemo, useRef } from 'react'
 import ChannelCard from './components/ChannelCard.jsx'
 import SearchBar from './components/SearchBar.jsx'
 import Player from './components/Player.jsx'
+import { searchIds, matchesQuery } from './searchIndex.js'
 
 const GITHUB_USER = 'NamasteOtaku'
 const GITHUB_REPO = 'Click-India-Watch'
 const ADS_ENABLED = true
+const DATA_BASE = `https://raw.githubusercontent.com/${GITHUB_USER}/${GITHUB_REPO}/main/data/site`
+
+// Shards a view needs before it can be complete: search, favorites and the
+// group filter cut across shards, the language filter maps onto them
+const shardsNeeded = (manifest, { searchQuery, selectedCategory, selectedLanguage, showFavOnly }) => {
+  if (searchQuery || showFavOnly || selectedCategory !== 'All') return manifest.shards
+  if (selectedLanguage !== 'All') {
+    return manifest.shards.filter(shard =>
+      shard.language === selectedLanguage || (shard.languages && selectedLanguage in shard.languages))
+  }
+  return []
+}
 
 export default function App() {
   const [channels, setChannels] = useState([])
+  // Catalog position by id, rebuilt only when a shard lands; search looks candidates up here
+  const channelIndex = useMemo(() => new Map(channels.map((ch, i) => [ch.id, i])), [channels])
+  const [searchIndex, setSearchIndex] = useState(null)
+  const [manifest, setManifest] = useState(null)
+  const requestedShards = useRef(new Set())
   const [filteredChannels, setFilteredChannels] = useState([])
   const [selectedChannel, setSelectedChannel] = useState(null)
   const [favorites, setFavorites] = useState(new Set())
@@ -40,9 +58,29 @@ export default function App() {
     fetchChannels()
   }, [])
 
+  // Shards the current filters need load right away
+  useEffect(() => {
+    if (!manifest) return
+    shardsNeeded(manifest, { searchQuery, selectedCategory, selectedLanguage, showFavOnly }).forEach(loadShard)
+  }, [manifest, searchQuery, selectedCategory, selectedLanguage, showFavOnly])
+
+  // The rest trickle in one at a time once the first view is up
+  useEffect(() => {
+    if (!manifest || loading) return
+    let cancelled = false
+    const idle = window.requestIdleCallback || (cb => setTimeout(cb, 200))
+    const next = () => {
+      const shard = manifest.shards.find(s => !requestedShards.current.has(s.file))
+      if (cancelled || !shard) return
+      loadShard(shard).finally(() => idle(next))
+    }
+    idle(next)
+    return () => { cancelled = true }
+  }, [manifest, loading])
+
   useEffect(() => {
     filterChannels()
-  }, [channels, searchQuery, selectedCategory, selectedLanguage, selectedStatus, showFavOnly, hideRestrictedStreams, favorites])
+  }, [channels, searchIndex, searchQuery, selectedCategory, selectedLanguage, selectedStatus, showFavOnly, hideRestrictedStreams, favorites])
 
   useEffect(() => {
     if (ADS_ENABLED) {
@@ -50,36 +88,64 @@ export default function App() {
     }
   }, [])
 
-  const fetchChannels = async () => {
-    try {
-      setLoading(true)
-      const chRes = await fetch(
-        `https://raw.githubusercontent.com/${GITHUB_USER}/${GITHUB_REPO}/main/data/channels.json`
-      )
-      if (!chRes.ok) throw new Error('Failed to fetch channels')
-      const chData = await chRes.json()
-
-      let statusData = {}
+  const fetchShard = async (base, file) => {
+    // Pre-gzipped copy where the browser can inflate it, minified JSON otherwise
+    if (typeof DecompressionStream !== 'undefined') {
       try {
-        const statusRes = await fetch(
-          `https://raw.githubusercontent.com/${GITHUB_USER}/${GITHUB_REPO}/main/data/status/latest.json`
-        )
-        if (statusRes.ok) {
-          const statuses = await statusRes.json()
-          statusData = Object.fromEntries(statuses.map(s => [s.id, s]))
+        const res = await fetch(`${base}/${file}.gz`)
+        if (res.ok) {
+          const stream = res.body.pipeThrough(new DecompressionStream('gzip'))
+          return await new Response(stream).json()
         }
       } catch (err) {
-        console.warn('Could not fetch status:', err.message)
+        console.warn(`Could not inflate ${file}.gz, fetching it uncompressed:`, err.message)
       }
+    }
+    const res = await fetch(`${base}/${file}`)
+    if (!res.ok) throw new Error(`Failed to fetch ${file}`)
+    return res.json()
+  }
 
-      const merged = chData.map(ch => ({
+  const loadShard = async (shard) => {
+    if (requestedShards.current.has(shard.file)) return true
+    requestedShards.current.add(shard.file)
+    try {
+      const records = await fetchShard(DATA_BASE, shard.file)
+      const merged = records.map(ch => ({
         ...ch,
-        status: statusData[ch.id]?.status || 'unknown',
-        http_code: statusData[ch.id]?.http_code || null,
-        resp_time_ms: statusData[ch.id]?.resp_time_ms || null,
+        status: ch.status || 'unknown',
+        http_code: ch.http_code || null,
+        resp_time_ms: ch.resp_time_ms || null,
       }))
+      setChannels(prev => [...prev, ...merged])
+      return true
+    } catch (err) {
+      // Not retried until the page reloads, so the background loader can't spin on it
+      console.warn(`Could not fetch ${shard.file}:`, err.message)
+      return false
+    }
+  }
+
+  const fetchChannels = async () => {
+    try {
+      setLoading(true)
+      const manifestRes = await fetch(`${DATA_BASE}/manifest.json`)
+      if (!manifestRes.ok) throw new Error('Failed to fetch channels')
+      const nextManifest = await manifestRes.json()
+
+      // The prebuilt search index loads alongside; plain substring search until it lands
+      if (nextManifest.search) {
+        fetchShard(DATA_BASE, nextManifest.search.file)
+          .then(setSearchIndex)
+          .catch(err => console.warn('Could not fetch search index:', err.message))
+      }
 
-      setChannels(merged)
+      // Shards are listed largest first: the first view only waits for the largest one
+      setChannels([])
+      if (nextManifest.shards.length && !(await loadShard(nextManifest.shards[0]))) {
+        throw new Error('Failed to fetch channels')
+      }
+      setManifest(nextManifest)
       setError(null)
     } catch (err) {
       setError(err.message)
@@ -102,14 +168,29 @@ export default function App() {
   }
 
   const getLanguages = () => {
-    const langs = new Set(channels.map(ch => ch.language).filter(Boolean))
+    // From the manifest too, so a language whose shard hasn't loaded yet can be picked
+    const langs = new Set([...(manifest ? manifest.languages : []), ...channels.map(ch => ch.language)].filter(Boolean))
     return ['All', ...Array.from(langs).sort()]
   }
 
   const filterChannels = () => {
     let result = channels
 
-    if (searchQuery) {
+    if (searchQuery && searchIndex) {
+      const ids = searchIds(searchIndex, searchQuery)
+      if (ids) {
+        // Only the candidates are visited, in catalog order; ids whose shard hasn't loaded are skipped
+        result = [...ids]
+          .map(id => channelIndex.get(id))
+          .filter(i => i !== undefined)
+          .sort((a, b) => a - b)
+          .map(i => channels[i])
+          .filter(ch => matchesQuery(ch, searchQuery))
+      } else {
+        // Queries of 1-2 character words alone get no candidates from the index; check every record
+        result = result.filter(ch => matchesQuery(ch, searchQuery))
+      }
+    } else if (searchQuery) {
       const term = searchQuery.toLowerCase()
       result = result.filter(
         ch =>
@@ -204,7 +285,7 @@ export default function App() {
       ) : (
         <>
           <div className="stats">
-            Showing {filteredChannels.length} of {channels.length} channels
+            Showing {filteredChannels.length} of {manifest ? manifest.channels : channels.length} channels
           </div>
 
           <div className="grid">
@@ -0,0 +1,52 @@
+// Client side of scripts/search_index.py: same normalization, same keys.
+
+export const normalizeText = (value) =>
+  (value || '')
+    .normalize('NFKD')
+    .replace(/\p{M}/gu, '')
+    .toLowerCase()
+    .replace(/[^\p{L}\p{N}]+/gu, ' ')
+    .trim()
+
+// 1-2 character words have no keys; they are only checked by matchesQuery
+const queryKeys = (word) => {
+  const keys = []
+  for (let i = 0; i + 3 <= word.length; i++) keys.push(word.slice(i, i + 3))
+  return keys
+}
+
+const decode = (deltas) => {
+  let total = 0
+  return deltas.map(d => (total += d))
+}
+
+const documentWords = (ch) =>
+  normalizeText([ch.name, ch.group, ch.language, ch.category].filter(Boolean).join(' ')).split(' ')
+
+// Candidate ids from the index, intersected rarest key first; null when no word can narrow them
+export const searchIds = (index, query) => {
+  const keys = new Set(normalizeText(query).split(' ').filter(Boolean).flatMap(queryKeys))
+  if (!keys.size) return null
+  const lists = []
+  for (const key of keys) {
+    const deltas = index.postings[key]
+    if (!deltas) return new Set()
+    lists.push(deltas)
+  }
+  lists.sort((a, b) => a.length - b.length)
+  let docs = new Set(decode(lists[0]))
+  for (const deltas of lists.slice(1)) {
+    const next = decode(deltas).filter(doc => docs.has(doc))
+    docs = new Set(next)
+    if (!docs.size) break
+  }
+  return new Set([...docs].map(doc => index.ids[doc]))
+}
+
+// Trigram intersection can over-match; check the record itself
+export const matchesQuery = (ch, query) => {
+  const words = documentWords(ch)
+  return normalizeText(query).split(' ').filter(Boolean).every(term =>
+    words.some(word => word.includes(term))
+  )
+}